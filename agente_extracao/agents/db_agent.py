@@ -1,7 +1,8 @@
 from services.logging_service import logging_service
-from services.db_service import inserir_dado
+from agents.reader_agent import ChunkStream
+from services.db_service import inserir_dado, inserir_dado_em_lotes
 
-def insert_into_db(formatter_output, raw_metadata=None):
+def insert_into_db(formatter_output, raw_metadata=None, substituir=False):
     """Insere dados, análise de campos e metadata de arquivo no banco.
 
     Parameters
@@ -10,6 +11,14 @@ def insert_into_db(formatter_output, raw_metadata=None):
         Deve conter chaves 'dados' (lista ou objeto) e 'analise_campos'.
     raw_metadata : dict | None
         Metadados completos do arquivo vindos do reader_agent (raw_data['metadata']).
+    substituir : bool
+        Substitui, na mesma transação da inserção, as versões anteriores do arquivo (mesmo hash).
+
+    Returns
+    -------
+    dict
+        ``id`` do arquivo inserido, ``records`` (quantidade de registros) e
+        ``analise_campos`` (para streaming, a análise calculada durante a inserção).
     """
     dados = formatter_output.get("dados", [])
     analise_campos = formatter_output.get("analise_campos")
@@ -26,8 +35,21 @@ def insert_into_db(formatter_output, raw_metadata=None):
             "original": raw_metadata,
         }
 
-    inserir_dado(dados, analise_campos, metadata)
-    records_count = len(dados) if isinstance(dados, list) else 1
-    logging_service.log_database_operation("INSERT", "dados", records_count)
-    return records_count
+    if isinstance(dados, ChunkStream):
+        # Streaming: insere bloco a bloco; a análise só fica completa ao final e é
+        # calculada uma única vez, na inserção (o valor gravado é o devolvido)
+        calculada = []
+
+        def analise_provider():
+            calculada.append(dados.analise())
+            return calculada[0]
+
+        registro_id = inserir_dado_em_lotes(dados, analise_provider, metadata, substituir)
+        records_count = dados.structure_info["total_rows"]
+        analise_campos = calculada[0] if calculada else None
+    else:
+        registro_id = inserir_dado(dados, analise_campos, metadata, substituir)
+        records_count = len(dados) if isinstance(dados, list) else 1
+    logging_service.log_database_operation("INSERT", "files", records_count)
+    return {"id": registro_id, "records": records_count, "analise_campos": analise_campos}
 
@@ -1,14 +1,11 @@
 import pandas as pd
 from typing import Any, Dict
+from services.stats_service import DataFrameStats
 
 def _gerar_analise_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
     if df.empty:
         return {"tipos": {}, "describe": {}, "shape": df.shape}
-    return {
-        "tipos": df.dtypes.apply(lambda x: str(x)).to_dict(),
-        "describe": df.describe(include='all').to_dict(),
-        "shape": df.shape
-    }
+    return DataFrameStats(exact=True).update(df).analise()
 
 def format_data(raw_data, file_type):
     """
@@ -22,6 +19,10 @@ def format_data(raw_data, file_type):
 
     # Caso de CSV: content.records
     if file_type in ("csv", "xls", "xlsx"):
+        # CSV ou .xlsx grande em modo streaming: blocos consumidos na inserção no
+        # banco, análise calculada incrementalmente pelo próprio stream
+        if isinstance(content, dict) and "records_chunks" in content:
+            return {"dados": content["records_chunks"], "analise_campos": None}
         # Excel pode ter múltiplas sheets
         if file_type in ("xls", "xlsx") and isinstance(content, dict) and "sheets" in content:
             # Concatena todas as sheets adicionando coluna sheet_name
@@ -33,14 +34,14 @@ def format_data(raw_data, file_type):
                     df_sheet["__sheet__"] = sheet_name
                     frames.append(df_sheet)
             df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-            analise = _gerar_analise_dataframe(df)
+            # Análise já calculada pelo reader_agent na leitura das planilhas
+            analise = content.get("analise_campos") or _gerar_analise_dataframe(df)
             return {"dados": df.to_dict(orient="records"), "analise_campos": analise}
         else:
             # CSV simples
             if isinstance(content, dict) and "records" in content:
                 records = content.get("records", [])
-                df = pd.DataFrame(records)
-                analise = _gerar_analise_dataframe(df)
+                analise = content.get("analise_campos") or _gerar_analise_dataframe(pd.DataFrame(records))
                 return {"dados": records, "analise_campos": analise}
 
     # Caso de XML
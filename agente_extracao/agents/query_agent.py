@@ -1,80 +1,222 @@
 import os
+import re
 import time
+import asyncio
 import sqlite3
-from openai import OpenAI
-from services.db_service import DB_PATH
+import json
+import hashlib
+import unicodedata
+from functools import lru_cache
+from openai import AsyncOpenAI, OpenAI, Timeout
+from services.db_service import (
+    buscar_trechos,
+    obter_resposta_cache,
+    obter_resumo,
+    obter_versao_dados,
+    salvar_resposta_cache,
+)
+from services.context_service import ContextPacker, contar_tokens, truncar_tokens
 from services.logging_service import logging_service
+from services.sql_service import ConsultaInvalida, catalogo, executar_consulta
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "deepseek/deepseek-r1-0528:free"
+# Timeouts (s) das chamadas ao LLM: total de leitura e de conexão; novas tentativas do cliente
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_S", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Lote assíncrono (answer_queries): perguntas simultâneas e tempo máximo de cada uma (s)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_QUERY_TIMEOUT = float(os.getenv("LLM_QUERY_TIMEOUT_S", "180"))
+# Rodadas de chamadas à ferramenta SQL por pergunta no modo SQL
+SQL_MAX_TOOL_ROUNDS = int(os.getenv("SQL_MAX_TOOL_ROUNDS", "3"))
+# Trechos candidatos buscados no índice textual para cada pergunta
+QUERY_TOP_K = int(os.getenv("QUERY_TOP_K", "20"))
+# Orçamento de tokens do prompt (pergunta, totais, trechos, schema e amostras)
+QUERY_CONTEXT_TOKENS = int(os.getenv("QUERY_CONTEXT_TOKENS", "4000"))
+# Limites por item: cada registro de exemplo e cada schema de arquivo
+QUERY_SAMPLE_TOKENS = 125
+QUERY_SCHEMA_TOKENS = 80
+# Cache de respostas do LLM: validade em segundos (0 = desativado) e máximo de entradas
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
 
 def get_database_info():
-    """Obtém informações do banco de dados de forma otimizada"""
+    """Obtém o resumo do banco (em cache enquanto os dados não mudarem)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Obtém informações da tabela
-        cursor.execute("SELECT COUNT(*) FROM dados")
-        total_records = cursor.fetchone()[0]
-        
-        # Obtém apenas alguns registros de exemplo (limitados)
-        cursor.execute("SELECT conteudo FROM dados LIMIT 3")
-        sample_records = cursor.fetchall()
+        resumo = obter_resumo()
         
-        # Trunca o conteúdo dos registros para evitar tokens excessivos
+        # Trunca o conteúdo dos registros de exemplo para evitar tokens excessivos
         truncated_records = []
-        for record in sample_records:
-            content = record[0]
-            # Limita cada registro a 500 caracteres
-            if len(content) > 500:
-                content = content[:500] + "..."
-            truncated_records.append(content)
-        
-        # Obtém estatísticas básicas
-        cursor.execute("SELECT LENGTH(conteudo) FROM dados")
-        lengths = [row[0] for row in cursor.fetchall()]
-        avg_length = sum(lengths) / len(lengths) if lengths else 0
-        
-        conn.close()
+        for content in resumo["samples"]:
+            # Limita cada registro a QUERY_SAMPLE_TOKENS tokens
+            truncated_records.append(truncar_tokens(content, QUERY_SAMPLE_TOKENS))
         
         return {
-            "total_records": total_records,
+            "total_records": resumo["total_files"],
+            "total_rows": resumo["total_rows"],
             "sample_records": truncated_records,
-            "average_content_length": round(avg_length, 2)
+            "average_content_length": resumo["average_file_bytes"],
+            "by_type": resumo["by_type"],
+            "files": resumo["files"],
         }
     except Exception as e:
         logging_service.log_application_error(f"Erro ao acessar banco de dados: {str(e)}")
         return None
 
+def _descrever_arquivos(db_info):
+    """Linhas com arquivo, tipo, quantidade de linhas e schema resumido para o prompt"""
+    linhas = []
+    for arquivo in db_info["files"]:
+        linha = f"- {arquivo['file_name']} ({arquivo['file_type']}, {arquivo['rows']} linhas)"
+        if arquivo["schema"]:
+            linha += f": {truncar_tokens(arquivo['schema'], QUERY_SCHEMA_TOKENS)}"
+        linhas.append(linha)
+    return linhas
+
+def get_relevant_chunks(query, top_k=None, token_budget=None):
+    """Trechos mais relevantes para a pergunta (BM25) que cabem no orçamento de tokens"""
+    top_k = top_k or QUERY_TOP_K
+    token_budget = token_budget or QUERY_CONTEXT_TOKENS
+    selected = []
+    used = 0
+    for chunk in buscar_trechos(query, top_k):
+        linhas = (
+            f"linha {chunk['row_start'] + 1}" if chunk["row_start"] == chunk["row_end"]
+            else f"linhas {chunk['row_start'] + 1}-{chunk['row_end'] + 1}"
+        )
+        trecho = f"[{chunk['file_name']}, {linhas}]\n{chunk['texto']}"
+        tokens = contar_tokens(trecho)
+        if used + tokens > token_budget:
+            continue
+        selected.append(trecho)
+        used += tokens
+    return selected
+
+def _normalizar_pergunta(query):
+    """Normaliza a pergunta para o cache: minúsculas, sem acentos, espaços e pontuação final"""
+    texto = unicodedata.normalize("NFKD", query.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip(" ?!.")
+
+def _chave_cache(query, model, versao):
+    return hashlib.sha256(f"{model}\n{versao}\n{_normalizar_pergunta(query)}".encode("utf-8")).hexdigest()
+
+def _ler_cache(cache_key):
+    try:
+        return obter_resposta_cache(cache_key, LLM_CACHE_TTL)
+    except sqlite3.Error:
+        return None
+
+def _gravar_cache(cache_key, query, model, versao, response):
+    try:
+        salvar_resposta_cache(cache_key, query, model, versao, response, LLM_CACHE_MAX_ENTRIES)
+    except sqlite3.Error:
+        pass
+
+@lru_cache(maxsize=4)
+def _get_client(base_url, api_key):
+    return OpenAI(**{**_client_options(), "base_url": base_url, "api_key": api_key})
+
+def get_client():
+    """Cliente OpenAI reutilizado entre chamadas (pool de conexões HTTP com keep-alive)"""
+    options = _client_options()
+    return _get_client(options["base_url"], options["api_key"])
+
+def _client_options():
+    return {
+        "base_url": os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL),
+        "api_key": os.getenv("API_KEY"),
+        "timeout": Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        "max_retries": LLM_MAX_RETRIES,
+    }
+
+def _build_prompt(query):
+    """Monta o prompt dentro do orçamento de tokens; None se o banco falhar.
+
+    Prioridade: trechos relevantes para a pergunta, depois o schema dos
+    arquivos e, por último, registros de exemplo. Os tokens usados por seção
+    são registrados no log de queries AI.
+    """
+    db_info = get_database_info()
+    if not db_info:
+        return None
+
+    por_tipo = ", ".join(
+        f"{tipo}: {info['files']} arquivos/{info['rows']} linhas"
+        for tipo, info in db_info["by_type"].items()
+    )
+    header = (
+        f"Total de registros: {db_info['total_records']}\n"
+        f"Total de linhas: {db_info['total_rows']} ({por_tipo})\n"
+        f"Comprimento médio dos registros: {db_info['average_content_length']}"
+    )
+    question = (
+        f"Pergunta: {query}\n"
+        "\nResponda de forma clara, útil e em português brasileiro. Seja específico e forneça informações detalhadas.\n"
+        "Resposta: "
+    )
+
+    packed, usage = (
+        ContextPacker(QUERY_CONTEXT_TOKENS)
+        .add("pergunta", [header, question], required=True)
+        .add("evidencias", get_relevant_chunks(query))
+        .add("schema", _descrever_arquivos(db_info))
+        .add("amostras", db_info["sample_records"])
+        .pack()
+    )
+    logging_service.log_ai_context(query, usage, QUERY_CONTEXT_TOKENS)
+
+    analysis = header
+    if packed["evidencias"]:
+        analysis += "\nTrechos relevantes:\n" + "\n\n".join(packed["evidencias"])
+    if packed["schema"]:
+        analysis += "\nArquivos:\n" + "\n".join(packed["schema"])
+    if packed["amostras"]:
+        analysis += f"\nRegistros de exemplo: {packed['amostras']}"
+    return f"Dados analisados: {analysis}\n{question}"
+
+def _cache_lookup(query, model):
+    """Retorna (chave, versão dos dados, resposta em cache ou None); chave None se o cache está desativado"""
+    if LLM_CACHE_TTL <= 0:
+        return None, None, None
+    # Mesma pergunta, mesmo modelo e dados inalterados: reutiliza a resposta
+    versao = obter_versao_dados()
+    cache_key = _chave_cache(query, model, versao)
+    return cache_key, versao, _ler_cache(cache_key)
+
+def _error_message(query, start_time, e):
+    """Registra o erro da query e retorna a mensagem exibida ao usuário"""
+    logging_service.log_application_error(f"Erro ao acessar banco de dados: {str(e)}")
+    response_time = time.time() - start_time
+    logging_service.log_ai_query(query, response_time, success=False)
+    logging_service.log_application_error(f"Erro na query AI: {str(e)}")
+
+    error_msg = str(e)
+    if "Input required: specify" in error_msg:
+        return "❌ Erro na configuração do LLM. Verifique sua API key."
+    elif "API key" in error_msg.lower():
+        return "❌ Erro de autenticação. Verifique sua API key."
+    else:
+        return f"❌ Erro ao processar a query: {error_msg}"
+
 def answer_query(query):
     """Responde uma query usando AI, seguindo lógica de instruções para uso de ferramentas (tools)"""
     start_time = time.time()
     try:
-        db_info = get_database_info()
-        if not db_info:
-            return "❌ Erro ao acessar o banco de dados"
-
-        # Monta análise resumida para o prompt
-        analysis = (
-            f"Total de registros: {db_info['total_records']}\n"
-            f"Registros de exemplo: {db_info['sample_records']}\n"
-            f"Comprimento médio dos registros: {db_info['average_content_length']}"
-        )
-
-        prompt = (
-            f"Dados analisados: {analysis}\n"
-            f"Pergunta: {query}\n"
-            "\nResponda de forma clara, útil e em português brasileiro. Seja específico e forneça informações detalhadas.\n"
-            "Resposta: "
-        )
+        model = os.getenv("MODEL_NAME", DEFAULT_MODEL)
+        cache_key, versao, cached = _cache_lookup(query, model)
+        if cached is not None:
+            logging_service.log_ai_query(query, time.time() - start_time, success=True, cached=True)
+            return cached
 
-        api_key = os.getenv("API_KEY")
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
+        prompt = _build_prompt(query)
+        if prompt is None:
+            return "❌ Erro ao acessar o banco de dados"
 
-        completion = client.chat.completions.create(
+        completion = get_client().chat.completions.create(
             extra_body={},
-            model=os.getenv("MODEL_NAME", "deepseek/deepseek-r1-0528:free"),
+            model=model,
             messages=[
                 {
                     "role": "user",
@@ -83,23 +225,221 @@ def answer_query(query):
             ]
         )
         
-        response = completion.choices[0].message.content or "Erro ao obter resposta do LLM."
+        content = completion.choices[0].message.content
+        response = content or "Erro ao obter resposta do LLM."
+        if content and cache_key:
+            _gravar_cache(cache_key, query, model, versao, content)
         response_time = time.time() - start_time
         logging_service.log_ai_query(query, response_time, success=True)
         
         return response
     
     except Exception as e:
-        
-        logging_service.log_application_error(f"Erro ao acessar banco de dados: {str(e)}")
-        response_time = time.time() - start_time
-        logging_service.log_ai_query(query, response_time, success=False)
-        logging_service.log_application_error(f"Erro na query AI: {str(e)}")
-        
-        error_msg = str(e)
-        if "Input required: specify" in error_msg:
-            return "❌ Erro na configuração do LLM. Verifique sua API key."
-        elif "API key" in error_msg.lower():
-            return "❌ Erro de autenticação. Verifique sua API key."
-        else:
-            return f"❌ Erro ao processar a query: {error_msg}"
\ No newline at end of file
+        return _error_message(query, start_time, e)
+
+async def _answer_query_async(get_async_client, query):
+    """Versão assíncrona de :func:`answer_query` (acesso ao banco em threads).
+
+    ``get_async_client`` só é chamado se a resposta não estiver em cache, como
+    ``get_client`` em :func:`answer_query`.
+    """
+    start_time = time.time()
+    model = os.getenv("MODEL_NAME", DEFAULT_MODEL)
+    cache_key, versao, cached = await asyncio.to_thread(_cache_lookup, query, model)
+    if cached is not None:
+        logging_service.log_ai_query(query, time.time() - start_time, success=True, cached=True)
+        return cached
+
+    prompt = await asyncio.to_thread(_build_prompt, query)
+    if prompt is None:
+        return "❌ Erro ao acessar o banco de dados"
+
+    completion = await get_async_client().chat.completions.create(
+        extra_body={},
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    content = completion.choices[0].message.content
+    if content and cache_key:
+        await asyncio.to_thread(_gravar_cache, cache_key, query, model, versao, content)
+    logging_service.log_ai_query(query, time.time() - start_time, success=True)
+    return content or "Erro ao obter resposta do LLM."
+
+async def answer_queries(questions, max_concurrency=None, timeout=None):
+    """Responde um lote de perguntas em paralelo (ex.: pacotes de perguntas padrão).
+
+    No máximo ``max_concurrency`` perguntas ficam em andamento ao mesmo tempo
+    e cada uma tem até ``timeout`` segundos (contados a partir do início do seu
+    processamento). Retorna as respostas (ou mensagens de erro) na mesma ordem
+    das perguntas; o tempo de cada uma é registrado em ``log_ai_query``.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or LLM_MAX_CONCURRENCY)
+    timeout = timeout or LLM_QUERY_TIMEOUT
+    clients = []
+
+    def get_async_client():
+        # Criado no primeiro uso: erros de configuração (ex.: sem API key) viram
+        # a mensagem de erro de cada pergunta, como em answer_query
+        if not clients:
+            clients.append(AsyncOpenAI(**_client_options()))
+        return clients[0]
+
+    async def run(query):
+        async with semaphore:
+            start_time = time.time()
+            try:
+                return await asyncio.wait_for(_answer_query_async(get_async_client, query), timeout)
+            except asyncio.TimeoutError:
+                logging_service.log_ai_query(query, time.time() - start_time, success=False)
+                return f"❌ Tempo limite de {timeout:g}s excedido para a pergunta."
+            except Exception as e:
+                return _error_message(query, start_time, e)
+
+    try:
+        return await asyncio.gather(*(run(query) for query in questions))
+    finally:
+        for client in clients:
+            await client.close()
+
+def answer_query_stream(query):
+    """Versão em streaming de :func:`answer_query`: gera a resposta em partes à
+    medida que o modelo as envia (para ``st.write_stream``).
+
+    Respostas em cache e mensagens de erro são geradas como uma única parte.
+    """
+    start_time = time.time()
+    try:
+        model = os.getenv("MODEL_NAME", DEFAULT_MODEL)
+        cache_key, versao, cached = _cache_lookup(query, model)
+        if cached is not None:
+            logging_service.log_ai_query(query, time.time() - start_time, success=True, cached=True)
+            yield cached
+            return
+
+        prompt = _build_prompt(query)
+        if prompt is None:
+            yield "❌ Erro ao acessar o banco de dados"
+            return
+
+        stream = get_client().chat.completions.create(
+            extra_body={},
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        parts = []
+        for event in stream:
+            delta = event.choices[0].delta.content if event.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception as e:
+        yield _error_message(query, start_time, e)
+        return
+
+    content = "".join(parts)
+    if not content:
+        yield "Erro ao obter resposta do LLM."
+    elif cache_key:
+        _gravar_cache(cache_key, query, model, versao, content)
+    logging_service.log_ai_query(query, time.time() - start_time, success=True)
+
+SQL_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "executar_sql",
+        "description": (
+            "Executa uma consulta SQLite somente leitura (uma instrução SELECT) sobre os "
+            "arquivos processados e retorna as colunas e linhas do resultado."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "sql": {"type": "string", "description": "Consulta SELECT em SQLite"}
+            },
+            "required": ["sql"],
+        },
+    },
+}
+
+def _sql_system_prompt():
+    return (
+        "Você responde perguntas sobre dados de arquivos processados consultando um banco SQLite. "
+        "Use a ferramenta executar_sql para calcular totais, contagens, médias e filtros; "
+        "não invente valores. Cada arquivo é uma view:\n"
+        f"{catalogo() or '(nenhum arquivo processado)'}\n"
+        "Colunas com espaços ou acentos devem ficar entre aspas duplas. Traga só as linhas "
+        "necessárias (use agregações e LIMIT). Responda em português brasileiro."
+    )
+
+def _run_sql_tool(arguments):
+    """Executa a chamada da ferramenta e retorna o resultado (ou o erro) em JSON para o modelo"""
+    try:
+        sql = json.loads(arguments or "{}").get("sql", "")
+        result = executar_consulta(sql)
+        logging_service.log_database_operation("SELECT", "sql_tool", len(result["rows"]))
+        return json.dumps(result, ensure_ascii=False, default=str)
+    except (ConsultaInvalida, ValueError, sqlite3.Error) as e:
+        # Erros voltam ao modelo como resultado da ferramenta, para que ele corrija a consulta
+        return json.dumps({"erro": str(e)}, ensure_ascii=False)
+
+def answer_query_sql(query):
+    """Responde a pergunta no modo SQL: o modelo recebe o catálogo de views e gera
+    consultas somente leitura, executadas localmente; só o resultado volta ao modelo.
+
+    Adequado a perguntas agregadas (totais, contagens, filtros por período).
+    """
+    start_time = time.time()
+    try:
+        model = os.getenv("MODEL_NAME", DEFAULT_MODEL)
+        cache_key, versao, cached = _cache_lookup(query, f"sql:{model}")
+        if cached is not None:
+            logging_service.log_ai_query(query, time.time() - start_time, success=True, cached=True)
+            return cached
+
+        messages = [
+            {"role": "system", "content": _sql_system_prompt()},
+            {"role": "user", "content": query},
+        ]
+        client = get_client()
+        message = None
+        for round_number in range(SQL_MAX_TOOL_ROUNDS + 1):
+            # Última rodada sem ferramentas: o modelo precisa responder com o que já tem
+            tools = [SQL_TOOL] if round_number < SQL_MAX_TOOL_ROUNDS else None
+            completion = client.chat.completions.create(
+                extra_body={},
+                model=model,
+                messages=messages,
+                **({"tools": tools} if tools else {}),
+            )
+            message = completion.choices[0].message
+            if not message.tool_calls:
+                break
+            messages.append({
+                "role": "assistant",
+                "content": message.content or "",
+                "tool_calls": [
+                    {
+                        "id": call.id,
+                        "type": "function",
+                        "function": {"name": call.function.name, "arguments": call.function.arguments},
+                    }
+                    for call in message.tool_calls
+                ],
+            })
+            for call in message.tool_calls:
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": _run_sql_tool(call.function.arguments),
+                })
+
+        content = message.content if message else None
+        response = content or "Erro ao obter resposta do LLM."
+        if content and cache_key:
+            _gravar_cache(cache_key, query, f"sql:{model}", versao, content)
+        logging_service.log_ai_query(query, time.time() - start_time, success=True)
+        return response
+
+    except Exception as e:
+        return _error_message(query, start_time, e)
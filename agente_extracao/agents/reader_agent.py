@@ -1,10 +1,31 @@
 import pandas as pd
 import pypdf
 import xml.etree.ElementTree as ET
-import re
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-import hashlib
+from services.file_service import HASH_ALGORITHM, calcular_hash_arquivo
+from services.logging_service import in_pool_worker, logging_service
+from services.pattern_service import group_values, pattern_scanner
+from services.stats_service import DataFrameStats
+
+# CSVs acima deste tamanho são lidos em blocos (modo streaming)
+CSV_STREAMING_THRESHOLD = int(os.getenv("CSV_STREAMING_THRESHOLD_MB", "100")) * 1024 * 1024
+# Linhas por bloco no modo streaming
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "50000"))
+# Planilhas .xlsx acima deste tamanho são lidas linha a linha (openpyxl read_only), em blocos
+EXCEL_STREAMING_THRESHOLD = int(os.getenv("EXCEL_STREAMING_THRESHOLD_MB", "20")) * 1024 * 1024
+EXCEL_CHUNK_SIZE = int(os.getenv("EXCEL_CHUNK_SIZE", "10000"))
+# Threads para converter planilhas em paralelo (1 = sequencial)
+EXCEL_SHEET_WORKERS = int(os.getenv("EXCEL_SHEET_WORKERS", "1"))
+# PDFs com pelo menos esta quantidade de páginas têm o texto extraído em paralelo
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+# Processos usados na extração paralela de PDFs (1 = sequencial)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+# Limites do XML: profundidade da estrutura e quantidade de raw_elements (0 = sem limite)
+XML_MAX_DEPTH = int(os.getenv("XML_MAX_DEPTH", "0"))
+XML_MAX_RAW_ELEMENTS = int(os.getenv("XML_MAX_RAW_ELEMENTS", "500000"))
 
 def read_file(file_path, file_type):
     """
@@ -25,14 +46,26 @@ def read_file(file_path, file_type):
         case _:
             raise ValueError(f"Tipo de arquivo não suportado: {file_type}")
 
+def is_streaming_file(file_path, file_type):
+    """Indica se o arquivo será lido em modo streaming (conteúdo não cabe em um único objeto)"""
+    if file_type == "csv":
+        return os.path.getsize(file_path) > CSV_STREAMING_THRESHOLD
+    return file_type in ("xls", "xlsx") and _is_streaming_excel(file_path)
+
+def _is_streaming_excel(file_path):
+    """Planilhas lidas pelo openpyxl (.xlsx/.xlsm) acima do limite são lidas em blocos"""
+    return (
+        Path(file_path).suffix.lower() in (".xlsx", ".xlsm")
+        and os.path.getsize(file_path) > EXCEL_STREAMING_THRESHOLD
+    )
+
 def _get_file_metadata(file_path, file_type):
     """Gera metadados básicos do arquivo"""
     file_path_obj = Path(file_path)
     file_stats = file_path_obj.stat()
     
     # Hash do arquivo para identificação única
-    with open(file_path, 'rb') as f:
-        file_hash = hashlib.md5(f.read()).hexdigest()
+    file_hash = calcular_hash_arquivo(file_path)
     
     return {
         "metadata": {
@@ -41,6 +74,7 @@ def _get_file_metadata(file_path, file_type):
             "file_type": file_type,
             "file_size": file_stats.st_size,
             "file_hash": file_hash,
+            "hash_algorithm": HASH_ALGORITHM,
             "created_at": datetime.fromtimestamp(file_stats.st_ctime).isoformat(),
             "modified_at": datetime.fromtimestamp(file_stats.st_mtime).isoformat(),
             "processed_at": datetime.now().isoformat()
@@ -48,191 +82,387 @@ def _get_file_metadata(file_path, file_type):
     }
 
 def _process_pdf(file_path, base_metadata):
-    """Processa PDF extraindo texto estruturado por páginas"""
+    """Processa PDF extraindo texto estruturado por páginas.
+
+    Documentos com ``PDF_PARALLEL_MIN_PAGES`` páginas ou mais têm as páginas
+    divididas em faixas entre ``PDF_WORKERS`` processos, cada um abrindo o PDF
+    de forma independente; o resultado é remontado na ordem original.
+    """
     try:
         with open(file_path, "rb") as f:
-            reader = pypdf.PdfReader(f)
-            
-            pages_content = []
-            full_text = ""
-            
-            for page_num, page in enumerate(reader.pages, 1):
-                page_text = page.extract_text()
-                full_text += page_text + "\n"
-                
-                pages_content.append({
-                    "page_number": page_num,
-                    "text": page_text,
-                    "word_count": len(page_text.split()),
-                    "char_count": len(page_text)
-                })
-            
-            # Extração de padrões comuns
-            extracted_data = _extract_common_patterns(full_text)
-            
-            return {
-                **base_metadata,
-                "document_info": {
-                    "total_pages": len(reader.pages),
-                    "total_words": len(full_text.split()),
-                    "total_chars": len(full_text)
-                },
-                "content": {
-                    "full_text": full_text,
-                    "pages": pages_content,
-                    "extracted_patterns": extracted_data
-                }
+            total_pages = len(pypdf.PdfReader(f).pages)
+
+        workers = min(PDF_WORKERS, total_pages)
+        # Dentro de um worker do processamento em lote não abre outro pool
+        if workers > 1 and total_pages >= PDF_PARALLEL_MIN_PAGES and not in_pool_worker():
+            bounds = [total_pages * i // workers for i in range(workers + 1)]
+            with ProcessPoolExecutor(
+                max_workers=workers, **logging_service.worker_pool_options()
+            ) as executor:
+                parts = executor.map(
+                    _extract_pages_text, [file_path] * workers, bounds[:-1], bounds[1:]
+                )
+                page_texts = [text for part in parts for text in part]
+        else:
+            page_texts = _extract_pages_text(file_path, 0, total_pages)
+
+        pages_content = []
+        pattern_matches = []
+        offset = 0
+        for page_num, page_text in enumerate(page_texts, 1):
+            pages_content.append({
+                "page_number": page_num,
+                "text": page_text,
+                "word_count": len(page_text.split()),
+                "char_count": len(page_text)
+            })
+            # Extração de padrões comuns, página a página (posições relativas ao full_text)
+            pattern_matches.extend(pattern_scanner.scan(page_text, page_num, offset))
+            offset += len(page_text) + 1
+        full_text = "".join(page_text + "\n" for page_text in page_texts)
+        extracted_data = group_values(pattern_matches, pattern_scanner.names)
+
+        return {
+            **base_metadata,
+            "document_info": {
+                "total_pages": total_pages,
+                "total_words": len(full_text.split()),
+                "total_chars": len(full_text)
+            },
+            "content": {
+                "full_text": full_text,
+                "pages": pages_content,
+                "extracted_patterns": extracted_data,
+                "pattern_matches": pattern_matches
             }
+        }
     except Exception as e:
         return {**base_metadata, "error": str(e), "content": None}
 
+def _extract_pages_text(file_path, start, end):
+    """Extrai o texto das páginas [start, end) abrindo o PDF de forma independente"""
+    with open(file_path, "rb") as f:
+        reader = pypdf.PdfReader(f)
+        return [reader.pages[index].extract_text() for index in range(start, end)]
+
 def _process_csv(file_path, base_metadata):
     """Processa CSV com análise de estrutura e tipos de dados"""
+    if os.path.getsize(file_path) > CSV_STREAMING_THRESHOLD:
+        return _process_csv_streaming(file_path, base_metadata)
     try:
         df = pd.read_csv(file_path)
         
-        # Análise da estrutura
-        column_info = {}
-        for col in df.columns:
-            column_info[col] = {
-                "data_type": str(df[col].dtype),
-                "non_null_count": int(df[col].count()),
-                "null_count": int(df[col].isnull().sum()),
-                "unique_values": int(df[col].nunique()),
-                "sample_values": df[col].dropna().head(3).tolist()
-            }
+        # Análise da estrutura (exata, em uma passada; reaproveitada pelo formatter)
+        stats = DataFrameStats(exact=True).update(df)
         
         return {
             **base_metadata,
-            "structure_info": {
-                "total_rows": len(df),
-                "total_columns": len(df.columns),
-                "columns": list(df.columns),
-                "column_analysis": column_info
-            },
+            "structure_info": stats.structure_info(),
             "content": {
                 "records": df.to_dict(orient="records"),
-                "summary_stats": df.describe(include='all').to_dict() if not df.empty else {}
+                "summary_stats": stats.describe() if not df.empty else {},
+                "analise_campos": stats.analise()
             }
         }
     except Exception as e:
         return {**base_metadata, "error": str(e), "content": None}
 
+def _process_csv_streaming(file_path, base_metadata):
+    """Processa CSV grande em blocos.
+
+    ``content.records_chunks`` é um :class:`CsvChunkStream`: os blocos só são
+    lidos quando ele é iterado (na inserção no banco) e ``structure_info`` /
+    ``summary_stats`` são preenchidos incrementalmente durante a iteração.
+    """
+    stream = CsvChunkStream(file_path, CSV_CHUNK_SIZE)
+    return {
+        **base_metadata,
+        "streaming": True,
+        "structure_info": stream.structure_info,
+        "content": {
+            "records_chunks": stream,
+            "summary_stats": stream.summary_stats,
+        },
+    }
+
+class ChunkStream:
+    """Iterável de blocos de registros de um arquivo com estatísticas incrementais.
+
+    Cada iteração produz uma lista de registros (dicts) de até ``chunk_size``
+    linhas; ao final, ``structure_info``, ``summary_stats`` e :meth:`analise`
+    refletem o arquivo inteiro sem que ele tenha sido carregado na memória
+    (estatísticas aproximadas de :class:`DataFrameStats`). Subclasses
+    implementam :meth:`_chunks`, que gera os blocos como DataFrames.
+    """
+
+    def __init__(self, file_path, chunk_size):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.structure_info = {
+            "total_rows": 0,
+            "total_columns": 0,
+            "columns": [],
+            "column_analysis": {},
+        }
+        self.summary_stats = {}
+        self.stats = DataFrameStats(exact=False)
+
+    def __iter__(self):
+        for chunk in self._chunks():
+            self.stats.update(chunk)
+            self.structure_info["total_rows"] = self.stats.rows
+            yield chunk.to_dict(orient="records")
+        self._finalize()
+
+    def _chunks(self):
+        raise NotImplementedError
+
+    def _finalize(self):
+        self.structure_info.update(self.stats.structure_info())
+        self.summary_stats.clear()
+        self.summary_stats.update(self.stats.describe())
+
+    def analise(self):
+        """Análise de campos no formato do formatter_agent (tipos, describe, shape)"""
+        return self.stats.analise()
+
+class CsvChunkStream(ChunkStream):
+    """Blocos de um CSV lido com ``pd.read_csv(chunksize=...)``"""
+
+    def _chunks(self):
+        with pd.read_csv(self.file_path, chunksize=self.chunk_size) as reader:
+            yield from reader
+
+class ExcelChunkStream(ChunkStream):
+    """Blocos das planilhas de um .xlsx, lidas linha a linha (openpyxl read_only).
+
+    Os registros trazem a coluna ``__sheet__`` (nome da planilha), como os do
+    formatter no modo não streaming. Cada bloco tem só as colunas da sua
+    planilha: as colunas de outras planilhas ficam ausentes (``null`` nas
+    consultas) em vez de NaN.
+    """
+
+    def _chunks(self):
+        with pd.ExcelFile(self.file_path, engine="openpyxl") as excel_file:
+            for sheet_name in excel_file.sheet_names:
+                for chunk in _iter_sheet_chunks(excel_file.book[sheet_name], self.chunk_size):
+                    chunk["__sheet__"] = sheet_name
+                    yield chunk
+
 def _process_excel(file_path, base_metadata):
-    """Processa Excel com suporte a múltiplas planilhas"""
+    """Processa Excel com suporte a múltiplas planilhas.
+
+    O workbook é aberto uma única vez e reutilizado por todas as planilhas;
+    com ``EXCEL_SHEET_WORKERS`` > 1 as planilhas são convertidas em paralelo
+    por threads. As estatísticas das planilhas são combinadas na análise do
+    workbook (``content.analise_campos``). Arquivos .xlsx grandes são lidos
+    em modo streaming (:func:`_process_excel_streaming`).
+    """
+    if _is_streaming_excel(file_path):
+        return _process_excel_streaming(file_path, base_metadata)
     try:
-        excel_file = pd.ExcelFile(file_path)
-        sheets_data = {}
-        
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Análise da estrutura por planilha
-            column_info = {}
-            for col in df.columns:
-                column_info[col] = {
-                    "data_type": str(df[col].dtype),
-                    "non_null_count": int(df[col].count()),
-                    "null_count": int(df[col].isnull().sum()),
-                    "unique_values": int(df[col].nunique())
-                }
-            
-            sheets_data[sheet_name] = {
-                "structure_info": {
-                    "total_rows": len(df),
-                    "total_columns": len(df.columns),
-                    "columns": list(df.columns),
-                    "column_analysis": column_info
-                },
-                "records": df.to_dict(orient="records")
-            }
-        
+        with pd.ExcelFile(file_path) as excel_file:
+            sheet_names = excel_file.sheet_names
+
+            def convert(sheet_name):
+                return _convert_sheet(excel_file.parse(sheet_name))
+
+            if EXCEL_SHEET_WORKERS > 1 and len(sheet_names) > 1:
+                with ThreadPoolExecutor(max_workers=EXCEL_SHEET_WORKERS) as executor:
+                    converted = list(executor.map(convert, sheet_names))
+            else:
+                converted = [convert(sheet_name) for sheet_name in sheet_names]
+
+        # Análise do workbook: planilhas com registros e a coluna __sheet__ do formatter
+        workbook_stats = DataFrameStats(exact=True)
+        sheet_rows = {}
+        for sheet_name, (payload, stats) in zip(sheet_names, converted):
+            if payload["records"]:
+                workbook_stats.merge(stats)
+                sheet_rows[sheet_name] = stats.rows
+        if sheet_rows:
+            workbook_stats.add_value_counts("__sheet__", sheet_rows)
+
         return {
             **base_metadata,
             "workbook_info": {
-                "total_sheets": len(excel_file.sheet_names),
-                "sheet_names": excel_file.sheet_names
+                "total_sheets": len(sheet_names),
+                "sheet_names": sheet_names
             },
             "content": {
-                "sheets": sheets_data
+                "sheets": {name: payload for name, (payload, _) in zip(sheet_names, converted)},
+                "analise_campos": workbook_stats.analise()
             }
         }
     except Exception as e:
         return {**base_metadata, "error": str(e), "content": None}
 
+def _convert_sheet(df):
+    """Gera a análise da estrutura e os registros de uma planilha já carregada"""
+    stats = DataFrameStats(exact=True).update(df)
+    payload = {
+        "structure_info": stats.structure_info(),
+        "records": df.to_dict(orient="records")
+    }
+    return payload, stats
+
+def _process_excel_streaming(file_path, base_metadata):
+    """Processa .xlsx grande em blocos.
+
+    ``content.records_chunks`` é um :class:`ExcelChunkStream`: as planilhas só
+    são lidas quando ele é iterado (na inserção no banco), ``EXCEL_CHUNK_SIZE``
+    linhas por vez, e a análise do workbook é acumulada durante a iteração.
+    """
+    try:
+        with pd.ExcelFile(file_path, engine="openpyxl") as excel_file:
+            sheet_names = excel_file.sheet_names
+        stream = ExcelChunkStream(file_path, EXCEL_CHUNK_SIZE)
+        return {
+            **base_metadata,
+            "streaming": True,
+            "workbook_info": {
+                "total_sheets": len(sheet_names),
+                "sheet_names": sheet_names
+            },
+            "structure_info": stream.structure_info,
+            "content": {
+                "records_chunks": stream,
+                "summary_stats": stream.summary_stats,
+            },
+        }
+    except Exception as e:
+        return {**base_metadata, "error": str(e), "content": None}
+
+def _iter_sheet_chunks(worksheet, chunk_size):
+    """Itera uma planilha openpyxl (read_only) em DataFrames de até ``chunk_size`` linhas.
+
+    A primeira linha é o cabeçalho, como em ``pd.read_excel``; linhas
+    totalmente vazias são ignoradas.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = _excel_columns(header)
+
+    batch = []
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        row = tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row))
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield pd.DataFrame.from_records(batch, columns=columns).infer_objects()
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch, columns=columns).infer_objects()
+
+def _excel_columns(header):
+    """Nomes de colunas no padrão do pandas (Unnamed: N e sufixo .N para repetidas)"""
+    columns = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = f"Unnamed: {index}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
 def _process_xml(file_path, base_metadata):
-    """Processa XML extraindo estrutura hierárquica completa"""
+    """Processa XML extraindo estrutura hierárquica completa.
+
+    A leitura usa ``iterparse`` em uma única passada: estrutura, contagem de
+    elementos e ``raw_elements`` são montados juntos e cada elemento é
+    descartado da árvore assim que termina, mantendo a memória limitada ao
+    resultado. ``XML_MAX_DEPTH`` limita a profundidade da estrutura e
+    ``XML_MAX_RAW_ELEMENTS`` a quantidade de ``raw_elements`` (0 = sem limite).
+    """
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        def xml_to_dict(element):
-            """Converte elemento XML para dicionário recursivamente"""
-            result = {}
-            
-            # Atributos
-            if element.attrib:
-                result['@attributes'] = element.attrib
-            
-            # Texto do elemento
-            if element.text and element.text.strip():
-                if len(element) == 0:  # Elemento folha
-                    return element.text.strip()
-                result['#text'] = element.text.strip()
-            
-            # Elementos filhos
-            children = {}
-            for child in element:
-                child_data = xml_to_dict(child)
-                if child.tag in children:
+        total_elements = 0
+        raw_elements = []
+        raw_truncated = False
+        root_info = None
+        xml_data = None
+        # Pilha de (elemento, filhos já convertidos, entrada em raw_elements); filhos é
+        # None abaixo do limite de profundidade (o elemento fica só em raw_elements)
+        stack = []
+
+        for event, elem in ET.iterparse(file_path, events=("start", "end")):
+            if event == "start":
+                total_elements += 1
+                if root_info is None:
+                    root_info = {"tag": elem.tag, "attrib": dict(elem.attrib)}
+                if XML_MAX_RAW_ELEMENTS and len(raw_elements) >= XML_MAX_RAW_ELEMENTS:
+                    raw_truncated = True
+                    raw_entry = None
+                else:
+                    # Texto só é conhecido no evento "end"; a ordem segue root.iter()
+                    raw_entry = {"tag": elem.tag, "attrib": dict(elem.attrib), "text": None}
+                    raw_elements.append(raw_entry)
+                within_depth = not XML_MAX_DEPTH or len(stack) < XML_MAX_DEPTH
+                parent_open = not stack or stack[-1][1] is not None
+                stack.append((elem, {} if within_depth and parent_open else None, raw_entry))
+                continue
+
+            _, children, raw_entry = stack.pop()
+            # O limite de profundidade vale só para a estrutura: o texto sempre vai para raw_elements
+            if raw_entry is not None:
+                raw_entry["text"] = elem.text
+            if children is None:
+                if stack:
+                    del stack[-1][0][:]
+                continue
+
+            value = _xml_element_value(elem, children)
+            if stack:
+                parent_elem, parent_children, _ = stack[-1]
+                if elem.tag in parent_children:
                     # Múltiplos elementos com mesmo nome -> lista
-                    if not isinstance(children[child.tag], list):
-                        children[child.tag] = [children[child.tag]]
-                    children[child.tag].append(child_data)
+                    if not isinstance(parent_children[elem.tag], list):
+                        parent_children[elem.tag] = [parent_children[elem.tag]]
+                    parent_children[elem.tag].append(value)
                 else:
-                    children[child.tag] = child_data
-            
-            result.update(children)
-            return result
-        
-        # Estatísticas do XML
-        def count_elements(element):
-            count = 1
-            for child in element:
-                count += count_elements(child)
-            return count
-        
-        xml_data = xml_to_dict(root)
-        
+                    parent_children[elem.tag] = value
+                # Libera o elemento já convertido
+                del parent_elem[:]
+            else:
+                xml_data = value
+                elem.clear()
+
+        root_tag = root_info["tag"]
         return {
             **base_metadata,
             "xml_info": {
-                "root_tag": root.tag,
-                "total_elements": count_elements(root),
-                "namespace": root.tag.split('}')[0][1:] if '}' in root.tag else None,
-                "root_attributes": root.attrib
+                "root_tag": root_tag,
+                "total_elements": total_elements,
+                "namespace": root_tag.split('}')[0][1:] if '}' in root_tag else None,
+                "root_attributes": root_info["attrib"],
+                "raw_elements_truncated": raw_truncated
             },
             "content": {
                 "structure": xml_data,
-                "raw_elements": [{"tag": elem.tag, "attrib": elem.attrib, "text": elem.text} 
-                               for elem in root.iter()]
+                "raw_elements": raw_elements
             }
         }
     except Exception as e:
         return {**base_metadata, "error": str(e), "content": None}
 
-def _extract_common_patterns(text):
-    """Extrai padrões comuns como emails, telefones, datas, CPF, CNPJ"""
-    patterns = {
-        "emails": re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text),
-        "phones": re.findall(r'(?:\+55\s?)?(?:\(?\d{2}\)?\s?)?(?:9\s?)?\d{4}[-\s]?\d{4}', text),
-        "dates": re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text),
-        "cpf": re.findall(r'\b\d{3}\.?\d{3}\.?\d{3}[-.]?\d{2}\b', text),
-        "cnpj": re.findall(r'\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}[-.]?\d{2}\b', text),
-        "money": re.findall(r'R\$\s?\d{1,3}(?:\.\d{3})*(?:,\d{2})?', text),
-        "urls": re.findall(r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*)?(?:\?(?:[\w&=%.])*)?(?:#(?:[\w.])*)?', text)
-    }
-    
-    # Remove padrões vazios
-    return {k: v for k, v in patterns.items() if v}
+def _xml_element_value(elem, children):
+    """Converte um elemento (com filhos já convertidos) para dicionário ou texto"""
+    result = {}
+
+    # Atributos
+    if elem.attrib:
+        result['@attributes'] = dict(elem.attrib)
+
+    # Texto do elemento
+    if elem.text and elem.text.strip():
+        if len(elem) == 0 and not children:  # Elemento folha
+            return elem.text.strip()
+        result['#text'] = elem.text.strip()
 
+    result.update(children)
+    return result
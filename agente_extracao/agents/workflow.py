@@ -2,23 +2,132 @@
 
 import os
 import time
-from typing import List, Dict
-from agents.reader_agent import read_file
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional
+from agents.reader_agent import is_streaming_file, read_file
 from agents.formatter_agent import format_data
 from agents.db_agent import insert_into_db
-from services.logging_service import logging_service
+from services.db_service import buscar_por_hash, close_connection
+from services.logging_service import StageTimer, logging_service
 from services.file_service import (
+    calcular_hash_arquivo,
     extract_zip_file,
     create_temp_directory,
     cleanup_temp_directory,
     get_supported_files_from_directory,
 )
 
+# Número de processos usados no processamento em lote (1 = sequencial)
+MAX_WORKERS = int(os.getenv("WORKFLOW_MAX_WORKERS", os.cpu_count() or 1))
+# Limite de bytes de arquivos sendo processados simultaneamente no lote
+MAX_INFLIGHT_BYTES = int(os.getenv("WORKFLOW_MAX_INFLIGHT_MB", "512")) * 1024 * 1024
 
-def process_file(file_path, file_type):
-    """Processa um único arquivo"""
+
+def _read_and_format(file_path, file_type):
+    """Lê e formata um arquivo (etapa CPU-bound, segura para rodar em outro processo).
+
+    Retorna a saída do formatter, os metadados e os tempos das etapas
+    ``read_file`` e ``format_data``.
+    """
+    timer = StageTimer()
+    with timer.span("read_file") as span:
+        raw_data = read_file(file_path, file_type)
+        metadata = raw_data.get("metadata") if isinstance(raw_data, dict) else None
+        span["bytes_in"] = (metadata or {}).get("file_size")
+    with timer.span("format_data") as span:
+        formatter_output = format_data(raw_data, file_type)
+        dados = formatter_output.get("dados")
+        if isinstance(dados, list):
+            span["rows_out"] = len(dados)
+    return formatter_output, metadata, timer.stages
+
+
+def _find_duplicate(file_path, force=False, seen_hashes=None):
+    """Verifica, antes da leitura, se o conteúdo do arquivo já foi ingerido.
+
+    Retorna um resultado "skipped" se o hash já existe no banco (ou já apareceu
+    em ``seen_hashes``, no mesmo lote) e None caso o arquivo deva ser processado.
+    Com ``force`` o banco não é consultado, apenas duplicatas do próprio lote.
+    """
+    file_hash = calcular_hash_arquivo(file_path)
+    existing_id = None
+    if seen_hashes is not None and file_hash in seen_hashes:
+        reason = "duplicate_in_batch"
+    elif not force and (existing_id := buscar_por_hash(file_hash)) is not None:
+        reason = "duplicate"
+    else:
+        if seen_hashes is not None:
+            seen_hashes.add(file_hash)
+        return None
+
+    logging_service.log_file_processing_skipped(os.path.basename(file_path), reason)
+    return {
+        "status": "skipped",
+        "reason": reason,
+        "file": os.path.basename(file_path),
+        "file_hash": file_hash,
+        "existing_id": existing_id,
+        "records": 0,
+        "processing_time": 0.0,
+    }
+
+
+def _store_result(
+    file_path, file_type, formatter_output, metadata, start_time, force=False, stages=None
+):
+    """Insere o resultado formatado no banco e registra o sucesso e os tempos das etapas"""
+    timer = StageTimer(stages)
+    with timer.span("inserir_dado") as span:
+        # Reprocessamento forçado substitui a versão anterior do arquivo (na mesma transação)
+        inserted = insert_into_db(formatter_output, raw_metadata=metadata, substituir=force)
+        span["rows_out"] = inserted["records"]
+
+    processing_time = time.time() - start_time
+    logging_service.log_file_processing_success(
+        os.path.basename(file_path),
+        inserted["records"],
+        processing_time,
+        file_size=(metadata or {}).get("file_size"),
+    )
+    logging_service.log_stage_timings(os.path.basename(file_path), file_type, timer.stages)
+
+    return {
+        "status": "success",
+        "file": os.path.basename(file_path),
+        "id": inserted["id"],
+        "records": inserted["records"],
+        "analise_campos": inserted["analise_campos"],
+        "processing_time": processing_time,
+        "timings": timer.stages,
+    }
+
+
+def _error_result(file_path, error):
+    logging_service.log_file_processing_error(os.path.basename(file_path), str(error))
+    return {"status": "error", "file": os.path.basename(file_path), "error": str(error)}
+
+
+def process_file(file_path, file_type, force=False):
+    """Processa um único arquivo.
+
+    Arquivos cujo hash já está no banco são ignorados (status "skipped");
+    ``force=True`` reprocessa e substitui os dados anteriores.
+    """
     start_time = time.time()
 
+    try:
+        duplicate = _find_duplicate(file_path, force)
+    except (IOError, ValueError) as e:
+        return _error_result(file_path, e)
+    if duplicate:
+        return duplicate
+
+    return _process_new_file(file_path, file_type, start_time, force)
+
+
+def _process_new_file(file_path, file_type, start_time, force=False):
+    """Lê, formata e insere um arquivo já verificado contra duplicatas"""
     try:
         # Log do início do processamento
         logging_service.log_file_processing_start(
@@ -26,53 +135,189 @@ def process_file(file_path, file_type):
         )
 
         # Processamento do arquivo
-        raw_data = read_file(file_path, file_type)
-        formatter_output = format_data(raw_data, file_type)
+        formatter_output, metadata, stages = _read_and_format(file_path, file_type)
 
         # Inserção no banco de dados com metadata do raw_data
-        metadata = raw_data.get("metadata") if isinstance(raw_data, dict) else None
-        records_count = insert_into_db(formatter_output, raw_metadata=metadata)
-
-        # Log do sucesso
-        processing_time = time.time() - start_time
-        logging_service.log_file_processing_success(
-            os.path.basename(file_path), records_count, processing_time
+        return _store_result(
+            file_path, file_type, formatter_output, metadata, start_time, force, stages
         )
 
-        return {
-            "status": "success",
-            "file": os.path.basename(file_path),
-            "records": records_count,
-            "processing_time": processing_time,
-        }
+    except (IOError, ValueError) as e:
+        return _error_result(file_path, e)
+
+
+def _file_size(file_info: Dict) -> int:
+    size = file_info.get("size")
+    if size is None:
+        try:
+            size = os.path.getsize(file_info["path"])
+        except OSError:
+            size = 0
+    return size
 
+
+def _new_pool(max_workers):
+    return ProcessPoolExecutor(max_workers=max_workers, **logging_service.worker_pool_options())
+
+
+def _store_or_error(file_path, file_type, formatter_output, metadata, start_time, force, stages):
+    try:
+        return _store_result(
+            file_path, file_type, formatter_output, metadata, start_time, force, stages
+        )
     except (IOError, ValueError) as e:
-        # Log do erro
-        logging_service.log_file_processing_error(os.path.basename(file_path), str(e))
-        return {"status": "error", "file": os.path.basename(file_path), "error": str(e)}
+        return _error_result(file_path, e)
+
+
+def _process_streaming_file(file_path, file_type, force):
+    return _process_new_file(file_path, file_type, time.time(), force)
 
 
-def process_multiple_files(file_list: List[Dict]) -> Dict:
-    """Processa múltiplos arquivos em lote"""
+def _process_in_pool(
+    file_list: List[Dict], max_workers: int, max_inflight_bytes: int, force=False
+) -> List[Dict]:
+    """Processa arquivos em um pool de processos.
+
+    A leitura e a formatação rodam nos workers, maiores arquivos primeiro, sem
+    ultrapassar ``max_inflight_bytes`` entre arquivos em processamento e
+    aguardando inserção (um arquivo maior que o limite roda sozinho). As
+    inserções no SQLite ficam em uma única thread do processo principal, a
+    única escritora do banco. Arquivos lidos em modo streaming (ex.: CSVs
+    grandes) são lidos e inseridos bloco a bloco por essa mesma thread,
+    enquanto o processo principal segue agendando e recolhendo os demais.
+    Se um worker morrer (ex.: falta de memória), os arquivos em andamento no
+    pool recebem erro e os demais seguem em um pool novo.
+    """
+    results: List[Optional[Dict]] = [None] * len(file_list)
+    seen_hashes = set()
+    pending = []
+    streaming = []
+    for index, file_info in enumerate(file_list):
+        try:
+            results[index] = _find_duplicate(file_info["path"], force, seen_hashes)
+            if results[index] is None:
+                if is_streaming_file(file_info["path"], file_info["type"]):
+                    streaming.append(index)
+                else:
+                    pending.append(index)
+        except (IOError, ValueError) as e:
+            results[index] = _error_result(file_info["path"], e)
+    pending.sort(key=lambda i: _file_size(file_list[i]), reverse=True)
+    running = {}
+    storing = {}
+    inflight_bytes = 0
+
+    executor = _new_pool(max_workers)
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    try:
+        # Streaming não ocupa o limite de bytes: a memória é limitada pelos blocos
+        for index in streaming:
+            file_info = file_list[index]
+            future = writer.submit(
+                _process_streaming_file, file_info["path"], file_info["type"], force
+            )
+            storing[future] = (index, 0)
+
+        while pending or running or storing:
+            # Agenda tudo que couber no limite de bytes (ou o maior, se nada estiver em andamento)
+            for index in list(pending):
+                if len(running) >= max_workers:
+                    break
+                size = _file_size(file_list[index])
+                if (running or storing) and inflight_bytes + size > max_inflight_bytes:
+                    continue
+                file_info = file_list[index]
+                logging_service.log_file_processing_start(
+                    os.path.basename(file_info["path"]), file_info["type"]
+                )
+                try:
+                    future = executor.submit(
+                        _read_and_format, file_info["path"], file_info["type"]
+                    )
+                except BrokenProcessPool:
+                    # Um worker morreu (ex.: falta de memória): segue em um pool novo
+                    executor.shutdown(wait=False)
+                    executor = _new_pool(max_workers)
+                    future = executor.submit(
+                        _read_and_format, file_info["path"], file_info["type"]
+                    )
+                running[future] = (index, size, time.time())
+                inflight_bytes += size
+                pending.remove(index)
+
+            done, _ = wait([*running, *storing], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in storing:
+                    index, size = storing.pop(future)
+                    inflight_bytes -= size
+                    results[index] = future.result()
+                    continue
+
+                index, size, start_time = running.pop(future)
+                file_info = file_list[index]
+                try:
+                    formatter_output, metadata, stages = future.result()
+                except (IOError, ValueError, BrokenProcessPool) as e:
+                    # Com o pool quebrado, só os arquivos em andamento nele são perdidos
+                    inflight_bytes -= size
+                    results[index] = _error_result(file_info["path"], e)
+                    continue
+                # Os bytes continuam reservados até a inserção
+                store = writer.submit(
+                    _store_or_error,
+                    file_info["path"],
+                    file_info["type"],
+                    formatter_output,
+                    metadata,
+                    start_time,
+                    force,
+                    stages,
+                )
+                storing[store] = (index, size)
+    finally:
+        executor.shutdown()
+        writer.submit(close_connection)
+        writer.shutdown()
+
+    return results
+
+
+def process_multiple_files(
+    file_list: List[Dict],
+    max_workers: Optional[int] = None,
+    max_inflight_bytes: Optional[int] = None,
+    force: bool = False,
+) -> Dict:
+    """Processa múltiplos arquivos em lote.
+
+    Com ``max_workers`` > 1 (padrão: ``WORKFLOW_MAX_WORKERS`` ou número de CPUs)
+    os arquivos são lidos em paralelo por um pool de processos; com 1 o
+    processamento é sequencial. ``max_inflight_bytes`` limita o total de bytes
+    em processamento simultâneo (padrão: ``WORKFLOW_MAX_INFLIGHT_MB``).
+    Arquivos já ingeridos (ou repetidos no lote) são ignorados, salvo ``force``.
+    """
     start_time = time.time()
-    results = []
-    successful = 0
-    failed = 0
+    max_workers = MAX_WORKERS if max_workers is None else max_workers
+    max_inflight_bytes = (
+        MAX_INFLIGHT_BYTES if max_inflight_bytes is None else max_inflight_bytes
+    )
 
     # Log do início do processamento em lote
     logging_service.log_batch_processing_start(len(file_list))
 
-    for file_info in file_list:
-        file_path = file_info["path"]
-        file_type = file_info["type"]
-
-        result = process_file(file_path, file_type)
-        results.append(result)
+    if max_workers > 1 and len(file_list) > 1:
+        results = _process_in_pool(
+            file_list, min(max_workers, len(file_list)), max_inflight_bytes, force
+        )
+    else:
+        results = [
+            process_file(file_info["path"], file_info["type"], force)
+            for file_info in file_list
+        ]
 
-        if result["status"] == "success":
-            successful += 1
-        else:
-            failed += 1
+    successful = sum(1 for result in results if result["status"] == "success")
+    skipped = sum(1 for result in results if result["status"] == "skipped")
+    failed = len(results) - successful - skipped
 
     # Log do resumo do processamento em lote
     total_time = time.time() - start_time
@@ -84,12 +329,13 @@ def process_multiple_files(file_list: List[Dict]) -> Dict:
         "total_files": len(file_list),
         "successful": successful,
         "failed": failed,
+        "skipped": skipped,
         "total_time": total_time,
         "results": results,
     }
 
 
-def process_zip_file(zip_path: str) -> Dict:
+def process_zip_file(zip_path: str, force: bool = False) -> Dict:
     """Processa um arquivo ZIP extraindo e processando todos os arquivos suportados"""
     temp_dir = None
 
@@ -111,7 +357,7 @@ def process_zip_file(zip_path: str) -> Dict:
         supported_files = get_supported_files_from_directory(temp_dir)
 
         # Processa todos os arquivos
-        batch_result = process_multiple_files(supported_files)
+        batch_result = process_multiple_files(supported_files, force=force)
 
         return {
             "status": "success",
@@ -120,6 +366,7 @@ def process_zip_file(zip_path: str) -> Dict:
             "processed_files": batch_result["total_files"],
             "successful": batch_result["successful"],
             "failed": batch_result["failed"],
+            "skipped": batch_result["skipped"],
             "total_time": batch_result["total_time"],
         }
 
@@ -0,0 +1,51 @@
+"""Benchmarks do workflow via pytest (fora da coleta padrão: nome ``bench_*``).
+
+    pytest benchmarks/bench_workflow.py
+    BENCH_SCALE=medium BENCH_TOLERANCE=0.3 pytest benchmarks/bench_workflow.py
+
+Cada caso falha se a menor latência ou o pico de RSS piorarem além da
+tolerância em relação a ``baseline.json``. Sem baseline da mesma escala e
+ambiente (CPUs, plataforma, Python e workers), os casos só são medidos.
+"""
+
+import warnings
+
+import pytest
+
+from benchmarks.corpus import build_corpus
+from benchmarks.runner import (
+    BENCH_SCALE,
+    CASES,
+    CORPUS_DIR,
+    baseline_mismatch,
+    compare,
+    load_baseline,
+    machine_info,
+    run_case,
+)
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return build_corpus(CORPUS_DIR, BENCH_SCALE)
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    baseline = load_baseline()
+    mismatch = baseline_mismatch(baseline, BENCH_SCALE, machine_info())
+    if mismatch:
+        warnings.warn(f"Benchmarks sem comparação: {mismatch}")
+        return {}
+    return baseline
+
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_workflow_benchmark(case, corpus, baseline):
+    result = run_case(case, corpus)
+    print(
+        f"{case}: {result['latency_s']:.3f}s, {result['throughput_mb_s']:.2f} MB/s, "
+        f"{result['peak_rss_mb']:.1f} MB RSS"
+    )
+    regressions = compare({case: result}, baseline)
+    assert not regressions, "\n".join(regressions)
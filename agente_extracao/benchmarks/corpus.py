@@ -0,0 +1,269 @@
+"""Gerador de corpora sintéticos e determinísticos para os benchmarks.
+
+Todos os arquivos são gerados a partir de uma semente fixa: a mesma escala
+produz sempre o mesmo conteúdo, então variações de desempenho vêm do código
+e não dos dados. Nenhuma dependência além das já usadas pela aplicação.
+"""
+
+import csv
+import io
+import os
+import random
+import zipfile
+from datetime import date, timedelta
+from typing import Dict, List
+
+from openpyxl import Workbook
+
+SEED = 150
+
+# Tamanhos de cada escala (BENCH_SCALE): linhas/colunas, abas, notas/itens, páginas, arquivos no ZIP
+SCALES = {
+    "small": {
+        "csv_long": (20000, 8),
+        "csv_wide": (500, 200),
+        "xlsx": (3, 5000, 10),
+        "xml_wide": (50, 40),
+        "xml_deep": (10, 40),
+        "pdf": (50, 40),
+        "zip": (3, 6),
+    },
+    "medium": {
+        "csv_long": (200000, 8),
+        "csv_wide": (5000, 300),
+        "xlsx": (5, 20000, 15),
+        "xml_wide": (500, 60),
+        "xml_deep": (50, 80),
+        "pdf": (300, 50),
+        "zip": (4, 20),
+    },
+    "large": {
+        "csv_long": (1000000, 10),
+        "csv_wide": (20000, 500),
+        "xlsx": (8, 100000, 20),
+        "xml_wide": (2000, 80),
+        "xml_deep": (200, 150),
+        "pdf": (1000, 60),
+        "zip": (5, 50),
+    },
+}
+
+_PALAVRAS = (
+    "nota fiscal produto servico cliente fornecedor pagamento entrega pedido "
+    "estoque imposto valor total parcela desconto frete cidade estado banco"
+).split()
+_UFS = ("SP", "RJ", "MG", "RS", "PR", "BA", "PE", "SC", "GO", "DF")
+
+
+def _cnpj(rng):
+    d = [rng.randrange(10) for _ in range(12)]
+    return f"{d[0]}{d[1]}.{d[2]}{d[3]}{d[4]}.{d[5]}{d[6]}{d[7]}/{d[8]}{d[9]}{d[10]}{d[11]}-{rng.randrange(100):02d}"
+
+
+def _valor(rng):
+    return round(rng.uniform(1, 10000), 2)
+
+
+def _data(rng):
+    return date(2020, 1, 1) + timedelta(days=rng.randrange(1500))
+
+
+def _frase(rng, palavras):
+    return " ".join(rng.choice(_PALAVRAS) for _ in range(palavras))
+
+
+def _linha(rng, cols):
+    """Linha com colunas de tipos variados (inteiro, decimal, data, texto, categoria)"""
+    valores = []
+    for c in range(cols):
+        match c % 5:
+            case 0:
+                valores.append(rng.randrange(1_000_000))
+            case 1:
+                valores.append(_valor(rng))
+            case 2:
+                valores.append(_data(rng).isoformat())
+            case 3:
+                valores.append(_frase(rng, 3))
+            case _:
+                valores.append(rng.choice(_UFS))
+    return valores
+
+
+def write_csv(path, rows, cols, seed=SEED):
+    """CSV com ``rows`` linhas e ``cols`` colunas de tipos variados"""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"col_{c}" for c in range(cols)])
+        for _ in range(rows):
+            writer.writerow(_linha(rng, cols))
+
+
+def write_xlsx(path, sheets, rows, cols, seed=SEED):
+    """Planilha com ``sheets`` abas de ``rows`` x ``cols``"""
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Aba{s + 1}")
+        ws.append([f"col_{c}" for c in range(cols)])
+        for _ in range(rows):
+            ws.append(_linha(rng, cols))
+    wb.save(path)
+
+
+def write_nfe_xml(path, notas, itens, profundidade=0, seed=SEED):
+    """XML no formato de um lote de NF-e: ``notas`` notas com ``itens`` itens cada.
+
+    ``profundidade`` acrescenta níveis de aninhamento em cada item (XML profundo).
+    """
+    rng = random.Random(seed)
+    partes = ['<?xml version="1.0" encoding="UTF-8"?>\n<enviNFe xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">']
+    for n in range(notas):
+        chave = "".join(str(rng.randrange(10)) for _ in range(44))
+        partes.append(
+            f'<NFe><infNFe Id="NFe{chave}" versao="4.00">'
+            f"<ide><cUF>35</cUF><nNF>{n + 1}</nNF><dhEmi>{_data(rng).isoformat()}T10:00:00-03:00</dhEmi></ide>"
+            f"<emit><CNPJ>{_cnpj(rng)}</CNPJ><xNome>{_frase(rng, 3)}</xNome>"
+            f"<enderEmit><xMun>{_frase(rng, 1)}</xMun><UF>{rng.choice(_UFS)}</UF></enderEmit></emit>"
+            f"<dest><CNPJ>{_cnpj(rng)}</CNPJ><xNome>{_frase(rng, 3)}</xNome></dest>"
+        )
+        total = 0.0
+        for i in range(itens):
+            valor = _valor(rng)
+            total += valor
+            aninhado = "".join(f"<nivel{d}>" for d in range(profundidade))
+            aninhado += f"<obs>{_frase(rng, 4)}</obs>"
+            aninhado += "".join(f"</nivel{d}>" for d in reversed(range(profundidade)))
+            partes.append(
+                f'<det nItem="{i + 1}"><prod><cProd>{rng.randrange(100000)}</cProd>'
+                f"<xProd>{_frase(rng, 4)}</xProd><NCM>{rng.randrange(10**8):08d}</NCM>"
+                f"<qCom>{rng.randrange(1, 100)}</qCom><vProd>{valor:.2f}</vProd></prod>"
+                f"<imposto><ICMS><ICMS00><vICMS>{valor * 0.18:.2f}</vICMS></ICMS00></ICMS></imposto>"
+                f"{aninhado}</det>"
+            )
+        partes.append(f"<total><ICMSTot><vNF>{total:.2f}</vNF></ICMSTot></total></infNFe></NFe>")
+    partes.append("</enviNFe>\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(partes))
+
+
+def _escapar_pdf(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, lines_per_page, seed=SEED):
+    """PDF com texto extraível: ``pages`` páginas de ``lines_per_page`` linhas.
+
+    O arquivo é montado diretamente (objetos, streams e tabela xref), com a
+    fonte padrão Helvetica; cada linha traz datas, valores e CNPJs para
+    exercitar a extração de padrões.
+    """
+    rng = random.Random(seed)
+    objetos = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for p in range(pages):
+        comandos = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for _ in range(lines_per_page):
+            linha = f"{_frase(rng, 6)} {_data(rng).strftime('%d/%m/%Y')} R$ {_valor(rng):.2f} {_cnpj(rng)}"
+            comandos.append(f"({_escapar_pdf(linha)}) Tj T*")
+        comandos.append("ET")
+        stream = "\n".join(comandos).encode("latin-1")
+        page_id, content_id = 4 + 2 * p, 5 + 2 * p
+        objetos[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objetos[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(page_id)
+    objetos[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    buffer = io.BytesIO()
+    buffer.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objetos):
+        offsets[obj_id] = buffer.tell()
+        buffer.write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, objetos[obj_id]))
+    xref = buffer.tell()
+    total = max(objetos) + 1
+    buffer.write(b"xref\n0 %d\n0000000000 65535 f \n" % total)
+    for obj_id in range(1, total):
+        buffer.write(b"%010d 00000 n \n" % offsets[obj_id])
+    buffer.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, xref))
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+
+
+def write_zip(path, members: List[str], profundidade, seed=SEED):
+    """ZIP com ``members`` distribuídos em ``profundidade`` níveis de pastas, mais um ZIP interno.
+
+    O i-ésimo arquivo vai para ``i % (profundidade + 1)`` níveis de pastas.
+    ``extract_zip_file`` não expande ZIPs internos; o ZIP interno mede o
+    custo de ignorá-los.
+    """
+    rng = random.Random(seed)
+
+    def adicionar(zf, nome, dados):
+        # Data fixa nas entradas: o mesmo conteúdo gera o mesmo ZIP
+        info = zipfile.ZipInfo(nome, date_time=(2024, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        zf.writestr(info, dados)
+
+    conteudos = []
+    for member in members:
+        with open(member, "rb") as f:
+            conteudos.append((os.path.basename(member), f.read()))
+
+    interno = io.BytesIO()
+    with zipfile.ZipFile(interno, "w") as inner:
+        for nome, dados in conteudos[:2]:
+            adicionar(inner, nome, dados)
+    with zipfile.ZipFile(path, "w") as zf:
+        for i, (nome, dados) in enumerate(conteudos):
+            pasta = "/".join(f"nivel{d}" for d in range(i % (profundidade + 1)))
+            adicionar(zf, f"{pasta}/{nome}" if pasta else nome, dados)
+        adicionar(zf, f"interno_{rng.randrange(1000)}.zip", interno.getvalue())
+
+
+def build_corpus(root, scale="small") -> Dict[str, Dict]:
+    """Gera (uma única vez por diretório) o corpus da escala e retorna ``{caso: arquivo}``.
+
+    Cada arquivo é descrito como em ``process_multiple_files``: ``path``,
+    ``name``, ``type`` e ``size``.
+    """
+    sizes = SCALES[scale]
+    root = os.path.join(root, scale)
+    os.makedirs(root, exist_ok=True)
+    geradores = {
+        "csv_long": ("csv_long.csv", "csv", lambda p: write_csv(p, *sizes["csv_long"])),
+        "csv_wide": ("csv_wide.csv", "csv", lambda p: write_csv(p, *sizes["csv_wide"], seed=SEED + 1)),
+        "xlsx": ("planilha.xlsx", "xlsx", lambda p: write_xlsx(p, *sizes["xlsx"])),
+        "xml_wide": ("nfe_wide.xml", "xml", lambda p: write_nfe_xml(p, *sizes["xml_wide"])),
+        "xml_deep": ("nfe_deep.xml", "xml", lambda p: write_nfe_xml(p, *sizes["xml_deep"], profundidade=20, seed=SEED + 2)),
+        "pdf": ("documento.pdf", "pdf", lambda p: write_pdf(p, *sizes["pdf"])),
+    }
+    corpus = {}
+    for case, (file_name, file_type, gerar) in geradores.items():
+        path = os.path.join(root, file_name)
+        if not os.path.exists(path):
+            gerar(path)
+        corpus[case] = {"path": path, "name": file_name, "type": file_type, "size": os.path.getsize(path)}
+
+    profundidade, copias = sizes["zip"]
+    path = os.path.join(root, "lote.zip")
+    if not os.path.exists(path):
+        pequenos = []
+        for i in range(copias):
+            # Conteúdos distintos: o workflow ignora arquivos com hash repetido
+            membro = os.path.join(root, f"membro_{i}.csv")
+            write_csv(membro, 2000, 8, seed=SEED + 100 + i)
+            pequenos.append(membro)
+        write_zip(path, pequenos + [corpus["xml_wide"]["path"], corpus["pdf"]["path"]], profundidade)
+    corpus["zip"] = {"path": path, "name": "lote.zip", "type": "zip", "size": os.path.getsize(path)}
+    return corpus
@@ -0,0 +1,238 @@
+"""Runner dos benchmarks do workflow: latência, vazão e pico de RSS por caso.
+
+Cada caso roda em um processo novo (spawn), em um diretório de trabalho
+próprio (banco e logs vazios), para que o pico de RSS e os caches sejam
+apenas do caso. Os resultados são comparados com um baseline salvo em JSON,
+gravado na mesma escala e máquina (CPUs, plataforma, Python e workers).
+
+Uso::
+
+    python -m benchmarks.runner                    # roda e compara com o baseline
+    python -m benchmarks.runner --update-baseline  # roda e grava o baseline
+    pytest benchmarks/bench_workflow.py            # o mesmo, via pytest
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import SCALES, build_corpus
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = Path(os.getenv("BENCH_BASELINE", BENCH_DIR / "baseline.json"))
+# Corpus gerado uma vez e reutilizado entre execuções
+CORPUS_DIR = Path(os.getenv("BENCH_CORPUS_DIR", BENCH_DIR / ".corpus"))
+BENCH_SCALE = os.getenv("BENCH_SCALE", "small")
+# Execuções medidas por caso (a latência é a mediana)
+BENCH_REPEAT = int(os.getenv("BENCH_REPEAT", "3"))
+# Workers dos pools (lote e páginas de PDF); ao menos 2, para medir o caminho com pool de processos
+BENCH_WORKERS = int(os.getenv("BENCH_WORKERS", max(2, os.cpu_count() or 1)))
+# Piora relativa tolerada em relação ao baseline (0.5 = até 50% pior)
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.5"))
+
+# Caso -> (função do workflow, arquivos do corpus)
+CASES = {
+    "process_file:csv_long": ("process_file", ["csv_long"]),
+    "process_file:csv_wide": ("process_file", ["csv_wide"]),
+    "process_file:xlsx": ("process_file", ["xlsx"]),
+    "process_file:xml_wide": ("process_file", ["xml_wide"]),
+    "process_file:xml_deep": ("process_file", ["xml_deep"]),
+    "process_file:pdf": ("process_file", ["pdf"]),
+    "process_multiple_files:mixed": (
+        "process_multiple_files",
+        ["csv_long", "csv_wide", "xlsx", "xml_wide", "xml_deep", "pdf"],
+    ),
+    "process_zip_file:zip": ("process_zip_file", ["zip"]),
+}
+# Métricas comparadas com o baseline (menor é melhor); a menor latência é a menos sensível a ruído
+COMPARED_METRICS = ("latency_min_s", "peak_rss_mb")
+
+
+def _peak_rss_mb():
+    import resource
+
+    # ru_maxrss em KB no Linux; os workers do pool aparecem em RUSAGE_CHILDREN
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    ) / 1024
+
+
+def machine_info(workers: int = None) -> Dict:
+    """Ambiente da medição; um baseline só é comparável no mesmo ambiente"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "workers": workers or BENCH_WORKERS,
+    }
+
+
+def _run_in_child(case, files, workdir, repeat, workers, queue):
+    """Executa o caso no processo filho e devolve as métricas pela fila"""
+    try:
+        os.chdir(workdir)
+        # Lidos na importação dos agentes (pool do lote e pool de páginas de PDF)
+        os.environ["WORKFLOW_MAX_WORKERS"] = str(workers)
+        os.environ["PDF_WORKERS"] = str(workers)
+        from agents.workflow import process_file, process_multiple_files, process_zip_file
+        from services.db_service import init_db
+
+        init_db()
+        operation = CASES[case][0]
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # force: as repetições reprocessam os arquivos já inseridos
+            if operation == "process_file":
+                result = process_file(files[0]["path"], files[0]["type"], force=True)
+                ok, rows = result["status"] == "success", result.get("records")
+            elif operation == "process_multiple_files":
+                result = process_multiple_files(files, force=True)
+                ok = result["successful"] == len(files)
+                rows = sum(r.get("records") or 0 for r in result["results"])
+            else:
+                result = process_zip_file(files[0]["path"], force=True)
+                ok, rows = result["status"] == "success" and not result["failed"], None
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                raise RuntimeError(f"{case} falhou: {result}")
+
+        latency = statistics.median(latencies)
+        size = sum(f["size"] for f in files)
+        queue.put({
+            "latency_s": latency,
+            "latency_min_s": min(latencies),
+            "latency_max_s": max(latencies),
+            "throughput_mb_s": size / (1024 * 1024) / latency,
+            "rows_per_s": rows / latency if rows else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "bytes": size,
+            "rows": rows,
+        })
+    except BaseException as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(case: str, corpus: Dict[str, Dict], repeat: int = None, workers: int = None) -> Dict:
+    """Mede um caso de :data:`CASES` em um processo e diretório novos"""
+    files = [corpus[name] for name in CASES[case][1]]
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        process = ctx.Process(
+            target=_run_in_child,
+            args=(case, files, workdir, repeat or BENCH_REPEAT, workers or BENCH_WORKERS, queue),
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+    if "error" in result:
+        raise RuntimeError(f"{case}: {result['error']}")
+    return result
+
+
+def run_all(
+    scale: str = None, repeat: int = None, cases: List[str] = None, workers: int = None
+) -> Dict:
+    """Gera (se preciso) o corpus da escala e mede os casos; retorna o relatório"""
+    scale = scale or BENCH_SCALE
+    workers = workers or BENCH_WORKERS
+    corpus = build_corpus(CORPUS_DIR, scale)
+    return {
+        "scale": scale,
+        "machine": machine_info(workers),
+        "cases": {case: run_case(case, corpus, repeat, workers) for case in cases or CASES},
+    }
+
+
+def load_baseline(path=None) -> Dict:
+    path = Path(path or BASELINE_PATH)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(report: Dict, path=None):
+    Path(path or BASELINE_PATH).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+def baseline_mismatch(baseline: Dict, scale: str, machine: Dict) -> Optional[str]:
+    """Motivo pelo qual o baseline não é comparável com a execução (None se for)"""
+    if not baseline:
+        return "sem baseline"
+    if baseline.get("scale") != scale:
+        return f"baseline da escala {baseline.get('scale')!r}, não {scale!r}"
+    recorded = baseline.get("machine", {})
+    differences = [
+        f"{key} {recorded.get(key)!r} != {value!r}"
+        for key, value in machine.items()
+        if recorded.get(key) != value
+    ]
+    if differences:
+        return "baseline de outro ambiente (" + ", ".join(differences) + ")"
+    return None
+
+
+def compare(cases: Dict[str, Dict], baseline: Dict, tolerance: float = None) -> List[str]:
+    """Regressões (mensagens) dos casos medidos em relação ao baseline da mesma escala"""
+    tolerance = BENCH_TOLERANCE if tolerance is None else tolerance
+    regressions = []
+    for case, result in cases.items():
+        reference = baseline.get("cases", {}).get(case)
+        if not reference:
+            continue
+        for metric in COMPARED_METRICS:
+            limit = reference[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{case}: {metric} {result[metric]:.3f} > {limit:.3f} "
+                    f"(baseline {reference[metric]:.3f}, tolerância {tolerance:.0%})"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do workflow de processamento")
+    parser.add_argument("--scale", choices=sorted(SCALES), default=BENCH_SCALE)
+    parser.add_argument("--repeat", type=int, default=BENCH_REPEAT)
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="caso a medir (repetível)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    parser.add_argument("--workers", type=int, default=BENCH_WORKERS, help="workers dos casos em lote")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.scale, args.repeat, args.case, args.workers)
+    for case, result in report["cases"].items():
+        print(
+            f"{case:32} {result['latency_s']:8.3f}s {result['throughput_mb_s']:8.2f} MB/s "
+            f"{result['peak_rss_mb']:8.1f} MB RSS"
+        )
+
+    if args.update_baseline:
+        save_baseline(report, args.baseline)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    mismatch = baseline_mismatch(baseline, report["scale"], report["machine"])
+    if mismatch:
+        print(f"Comparação não feita: {mismatch}; use --update-baseline")
+        return 0
+    regressions = compare(report["cases"], baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSÃO {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,16 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
-from agents.query_agent import answer_query
+from agents.query_agent import answer_query_sql, answer_query_stream
 from agents.workflow import process_file, process_multiple_files, process_zip_file
-from services.db_service import listar_arquivos, deletar_arquivo_por_id, obter_registro
+from services.db_service import (
+    contar_linhas,
+    deletar_arquivo_por_id,
+    ler_linhas,
+    listar_arquivos,
+    obter_analise,
+    obter_metadata,
+)
 from services.file_service import (
     detectar_tipo_arquivo,
     get_supported_file_type,
@@ -20,6 +27,8 @@ load_dotenv()
 init_db()
 
 API_KEY = os.getenv("API_KEY")
+# Registros exibidos por página na gestão de arquivos
+LINHAS_POR_PAGINA = 50
 
 logging_service.log_application_start()
 
@@ -42,11 +51,38 @@ with st.sidebar:
             st.metric("Falhas", stats.get("failed", 0))
             st.metric("ZIPs Processados", stats.get("zip_extractions", 0))
             st.metric("Lotes Processados", stats.get("batch_operations", 0))
+            st.metric("Arquivos Ignorados", stats.get("skipped", 0))
+            st.metric("Linhas Processadas", stats.get("rows_processed", 0))
+            st.metric("MB Processados", round(stats.get("bytes_processed", 0) / (1024 * 1024), 2))
         else:
             st.warning("Logs não disponíveis")
     except RuntimeError as e:
         st.error(f"Erro ao carregar estatísticas: {str(e)}")
 
+    stage_stats = logging_service.get_stage_stats()
+    if stage_stats and "error" not in stage_stats:
+        with st.expander("⏱️ Tempos por Etapa"):
+            st.table(
+                [
+                    {
+                        "Tipo": file_type,
+                        "Etapa": stage,
+                        "N": entry["count"],
+                        "p50 (s)": round(entry.get("p50_s", 0), 3),
+                        "p95 (s)": round(entry.get("p95_s", 0), 3),
+                        "p99 (s)": round(entry.get("p99_s", 0), 3),
+                    }
+                    for file_type, stages in stage_stats.items()
+                    for stage, entry in stages.items()
+                ]
+            )
+            st.download_button(
+                "Exportar JSON",
+                logging_service.export_stage_stats(),
+                file_name="stage_stats.json",
+                mime="application/json",
+            )
+
 tab1, tab2, tab3 = st.tabs(["📁 Processamento", "❓ Consultas AI", "🗂 Gestão de Arquivos"])
 
 with tab1:
@@ -58,6 +94,10 @@ with tab1:
         ["📄 Arquivo Único", "📦 Arquivo ZIP", "📂 Múltiplos Arquivos"],
         horizontal=True,
     )
+    force_reprocess = st.checkbox(
+        "♻️ Reprocessar arquivos já processados",
+        help="Por padrão, arquivos com conteúdo idêntico a um já processado são ignorados",
+    )
 
     if upload_option == "📄 Arquivo Único":
         uploaded_file = st.file_uploader(
@@ -86,7 +126,7 @@ with tab1:
 
             if st.button("🚀 Processar Arquivo", type="primary"):
                 with st.spinner(f"Processando {uploaded_file.name}..."):
-                    result = process_file(file_path, file_type)
+                    result = process_file(file_path, file_type, force=force_reprocess)
 
                     if result["status"] == "success":
                         st.success(f"✅ {result['file']} processado com sucesso!")
@@ -98,14 +138,30 @@ with tab1:
                         with col3:
                             st.metric("Status", "✅ Sucesso")
 
+                        with st.expander("⏱️ Tempos por Etapa"):
+                            st.table(
+                                [
+                                    {
+                                        "Etapa": stage,
+                                        "Tempo (s)": round(span["wall_s"], 3),
+                                        "CPU (s)": round(span["cpu_s"], 3) if span["cpu_s"] is not None else None,
+                                        "Bytes": span["bytes_in"],
+                                        "Linhas": span["rows_out"],
+                                    }
+                                    for stage, span in result.get("timings", {}).items()
+                                ]
+                            )
+
                         # Exibe análise de campos se disponível
-                        from services.db_service import ler_dados
-                        dados_banco = ler_dados()
-                        if dados_banco:
-                            analise_campos = dados_banco[-1].get("analise_campos")
-                            if analise_campos:
-                                with st.expander("🔎 Análise dos Campos do Arquivo"):
-                                    st.write(analise_campos)
+                        analise_campos = result.get("analise_campos")
+                        if analise_campos:
+                            with st.expander("🔎 Análise dos Campos do Arquivo"):
+                                st.write(analise_campos)
+                    elif result["status"] == "skipped":
+                        st.info(
+                            f"⏭️ {result['file']} já foi processado anteriormente "
+                            "(marque a opção de reprocessar para substituí-lo)"
+                        )
                     else:
                         st.error(
                             f"❌ Erro ao processar {result['file']}: {result['error']}"
@@ -128,7 +184,7 @@ with tab1:
 
             if st.button("🚀 Processar ZIP", type="primary"):
                 with st.spinner(f"Processando ZIP {uploaded_zip.name}..."):
-                    result = process_zip_file(zip_path)
+                    result = process_zip_file(zip_path, force=force_reprocess)
 
                     if result["status"] == "success":
                         st.success(
@@ -143,7 +199,11 @@ with tab1:
                             st.metric("Sucessos", result["successful"])
                         with col4:
                             st.metric("Falhas", result["failed"])
-                        st.metric("Tempo Total", f"{result['total_time']:.2f}s")
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric("Ignorados (duplicados)", result["skipped"])
+                        with col2:
+                            st.metric("Tempo Total", f"{result['total_time']:.2f}s")
                     elif result["status"] == "warning":
                         st.warning(f"⚠️ {result['message']}")
                     else:
@@ -179,7 +239,7 @@ with tab1:
 
                 if file_paths:
                     with st.spinner(f"Processando {len(file_paths)} arquivos..."):
-                        result = process_multiple_files(file_paths)
+                        result = process_multiple_files(file_paths, force=force_reprocess)
                         st.success("✅ Processamento em lote concluído!")
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
@@ -196,6 +256,8 @@ with tab1:
                                     st.success(
                                         f"✅ {file_result['file']} - {file_result['records']} registros"
                                     )
+                                elif file_result["status"] == "skipped":
+                                    st.info(f"⏭️ {file_result['file']} - já processado")
                                 else:
                                     st.error(
                                         f"❌ {file_result['file']} - {file_result['error']}"
@@ -214,6 +276,11 @@ with tab2:
             {"role": "assistant", "content": "Olá! Faça uma pergunta sobre os dados processados."}
         ]
 
+    modo_sql = st.toggle(
+        "Modo SQL (totais, contagens e filtros calculados no banco)",
+        help="O modelo gera consultas somente leitura executadas localmente; só o resultado é enviado a ele.",
+    )
+
     # Renderiza histórico
     for msg in st.session_state.chat_messages:
         with st.chat_message(msg["role"]):
@@ -227,11 +294,14 @@ with tab2:
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        # Mensagem de processamento
+        # Resposta exibida à medida que o modelo gera os tokens
         with st.chat_message("assistant"):
-            with st.spinner("Consultando modelo..."):
-                resposta = answer_query(user_input)
+            if modo_sql:
+                with st.spinner("Consultando modelo..."):
+                    resposta = answer_query_sql(user_input)
                 st.markdown(resposta)
+            else:
+                resposta = st.write_stream(answer_query_stream(user_input))
         st.session_state.chat_messages.append({"role": "assistant", "content": resposta})
 
     # Limpar histórico
@@ -265,11 +335,14 @@ with tab3:
 
         st.subheader(f"Registros ({len(arquivos_filtrados)})")
         for arq in arquivos_filtrados:
-            exp_label = f"{arq.get('file_name') or 'SemNome'} | {arq.get('file_type') or '?'} | Registros: {arq.get('record_count')}"
+            exp_label = (
+                f"{arq.get('file_name') or 'SemNome'} | {arq.get('file_type') or '?'} | "
+                f"Registros: {arq.get('record_count')} | {arq.get('byte_size', 0) / 1024:.1f} KB"
+            )
             with st.expander(exp_label):
                 col_info, col_actions = st.columns([4,1])
                 with col_info:
-                    st.write({k: v for k, v in arq.items() if k not in ("record_count",)})
+                    st.write({k: v for k, v in arq.items() if k not in ("record_count", "byte_size")})
                 with col_actions:
                     if st.button("🗑", key=f"del_{arq['id']}", help="Remover este arquivo"):
                         sucesso = deletar_arquivo_por_id(arq['id'])
@@ -280,16 +353,31 @@ with tab3:
                             st.error("Erro ao remover")
                 st.caption(f"Hash: {arq.get('file_hash')}")
 
-                # Carregar dados completos sob demanda
-                registro = obter_registro(arq['id'])
-                if registro:
-                    with st.expander("📄 Dados (JSON)"):
-                        st.json(registro.get("conteudo"))
-                        if registro.get("analise_campos"):
-                            st.markdown("**Análise de Campos:**")
-                            st.json(registro.get("analise_campos"))
-                        if registro.get("metadata"):
-                            st.markdown("**Metadata Completa:**")
-                            st.json(registro.get("metadata"))
+                # Dados carregados só quando pedidos (o corpo do expander roda mesmo fechado),
+                # uma página de registros por vez
+                if st.toggle("📄 Ver dados", key=f"dados_{arq['id']}"):
+                    total_linhas = contar_linhas(arq['id'])
+                    paginas = max((total_linhas + LINHAS_POR_PAGINA - 1) // LINHAS_POR_PAGINA, 1)
+                    pagina = st.number_input(
+                        f"Página (de {paginas})",
+                        min_value=1,
+                        max_value=paginas,
+                        value=1,
+                        key=f"pagina_{arq['id']}",
+                    )
+                    inicio = (pagina - 1) * LINHAS_POR_PAGINA
+                    st.caption(
+                        f"Registros {inicio + 1 if total_linhas else 0}–"
+                        f"{min(inicio + LINHAS_POR_PAGINA, total_linhas)} de {total_linhas}"
+                    )
+                    st.json(ler_linhas(arq['id'], inicio, LINHAS_POR_PAGINA))
+                    analise_campos = obter_analise(arq['id'])
+                    if analise_campos:
+                        st.markdown("**Análise de Campos:**")
+                        st.json(analise_campos)
+                    metadata = obter_metadata(arq['id'])
+                    if metadata:
+                        st.markdown("**Metadata Completa:**")
+                        st.json(metadata)
 
         st.caption("Remover um arquivo exclui seus dados e análises; consultas futuras não o incluirão.")
@@ -0,0 +1,80 @@
+import re
+from typing import Dict, List, Tuple
+
+# Tokenizador local opcional (tiktoken); sem ele, os tokens são estimados
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+# Estimador: palavras longas viram vários tokens (~1 a cada 6 caracteres) e
+# cada sinal de pontuação conta como um token (JSON tem muitos)
+_PECAS = re.compile(r"\w+|[^\w\s]")
+_CHARS_POR_TOKEN_PALAVRA = 6
+# Um token quase nunca cobre mais caracteres que isso: textos maiores são cortados
+# antes da contagem, para que truncar custe o mesmo para qualquer tamanho de texto
+_MAX_CHARS_POR_TOKEN = 8
+
+def contar_tokens(texto: str) -> int:
+    """Quantidade de tokens do texto (exata com tiktoken, estimada sem ele)."""
+    if not texto:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(texto, disallowed_special=()))
+    return sum(
+        1 + (len(peca) - 1) // _CHARS_POR_TOKEN_PALAVRA if peca[0].isalnum() or peca[0] == "_" else 1
+        for peca in _PECAS.findall(texto)
+    )
+
+def truncar_tokens(texto: str, limite: int, sufixo: str = "...") -> str:
+    """Corta o texto para no máximo ``limite`` tokens (acrescentando ``sufixo`` se cortou)."""
+    if len(texto) > limite * _MAX_CHARS_POR_TOKEN:
+        texto = texto[:limite * _MAX_CHARS_POR_TOKEN]
+    elif contar_tokens(texto) <= limite:
+        return texto
+    limite = max(limite - contar_tokens(sufixo), 0)
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(texto, disallowed_special=())[:limite]) + sufixo
+    # Busca binária pelo maior prefixo que cabe no limite
+    inicio, fim = 0, len(texto)
+    while inicio < fim:
+        meio = (inicio + fim + 1) // 2
+        if contar_tokens(texto[:meio]) <= limite:
+            inicio = meio
+        else:
+            fim = meio - 1
+    return texto[:inicio] + sufixo
+
+class ContextPacker:
+    """Monta o contexto do prompt dentro de um orçamento de tokens.
+
+    Seções obrigatórias entram sempre; as demais são preenchidas na ordem em
+    que foram adicionadas (prioridade), item a item, enquanto couberem no
+    orçamento restante. :meth:`pack` retorna os itens incluídos por seção e
+    os tokens usados por seção (para registro no log).
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self._sections: List[Tuple[str, List[str], bool]] = []
+
+    def add(self, name: str, items: List[str], required: bool = False):
+        self._sections.append((name, [item for item in items if item], required))
+        return self
+
+    def pack(self) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+        packed = {name: [] for name, _, _ in self._sections}
+        usage = dict.fromkeys(packed, 0)
+        used = 0
+        ordered = [s for s in self._sections if s[2]] + [s for s in self._sections if not s[2]]
+        for name, items, required in ordered:
+            for item in items:
+                tokens = contar_tokens(item)
+                if not required and used + tokens > self.budget:
+                    continue
+                packed[name].append(item)
+                usage[name] += tokens
+                used += tokens
+        usage["total"] = used
+        return packed, usage
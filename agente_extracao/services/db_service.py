@@ -1,194 +1,602 @@
 import sqlite3
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
+import math
+import time
+import random
+import threading
+import functools
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterable, Callable, Tuple
+from services.logging_service import current_timer
 
 DB_PATH = "data/banco.db"
+# Espera (s) do SQLite por um lock antes de acusar "database is locked"
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+# Novas tentativas (com backoff exponencial) quando o banco continua ocupado
+DB_MAX_RETRIES = int(os.getenv("DB_MAX_RETRIES", "5"))
+DB_RETRY_BASE_DELAY = 0.05
+DB_CACHE_SIZE_MB = int(os.getenv("DB_CACHE_SIZE_MB", "64"))
+DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", "256"))
+# Statements preparados mantidos por conexão (cache do módulo sqlite3)
+DB_STATEMENT_CACHE = 256
+# Se ativo, o índice de file_hash é UNIQUE (impede o mesmo arquivo duas vezes no banco)
+UNIQUE_FILE_HASH = os.getenv("DB_UNIQUE_FILE_HASH", "0") == "1"
+# Quantidade máxima de entradas mantidas no cache de fingerprints de arquivos
+FINGERPRINT_CACHE_MAX = int(os.getenv("FINGERPRINT_CACHE_MAX", "10000"))
+# Índice de texto completo (FTS5) dos registros, usado na busca de trechos para o LLM
+FTS_ENABLED = os.getenv("DB_FTS_ENABLED", "1") == "1"
+# Tamanho aproximado (caracteres) de cada trecho indexado: linhas curtas são
+# agrupadas e textos longos (ex.: PDFs) divididos até esse tamanho
+FTS_CHUNK_CHARS = int(os.getenv("DB_FTS_CHUNK_CHARS", "1000"))
+# Palavras ignoradas na consulta de texto completo
+FTS_STOPWORDS = frozenset(
+    "a o e as os de da do das dos em no na nos nas um uma uns umas por para com sem "
+    "que qual quais quem como onde quando quanto quantos quantas se ao aos à às é "
+    "são foi ser ter tem há me meu minha isso esse essa este esta the of and or".split()
+)
 
+_local = threading.local()
+# Resumo do banco em cache no processo, válido enquanto a versão dos dados não mudar
+_resumo_cache: Dict[str, Any] = {"versao": None, "resumo": None}
+_resumo_lock = threading.Lock()
+# Arquivos listados (mais recentes) e linhas de exemplo no resumo do banco
+RESUMO_MAX_ARQUIVOS = 50
+RESUMO_AMOSTRAS = 3
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE_MB * 1024 * 1024}")
+    return conn
+
+def get_connection() -> sqlite3.Connection:
+    """Retorna a conexão da thread atual, criando-a na primeira chamada.
+
+    Cada thread (e cada processo, após um fork) tem uma única conexão
+    reutilizada por todas as funções do módulo: os statements ficam
+    preparados no cache da conexão e o banco opera em WAL, de modo que
+    leituras não bloqueiam a escrita de outras sessões.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != (os.getpid(), DB_PATH):
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        conn = _connect()
+        _local.conn = conn
+        _local.key = (os.getpid(), DB_PATH)
+    return conn
+
+def close_connection():
+    """Fecha a conexão da thread atual (uma nova é aberta no próximo uso)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _local.conn = None
+        if _local.key[0] == os.getpid():
+            conn.close()
+
+@contextmanager
+def transacao():
+    """Executa o bloco em uma transação na conexão da thread, com rollback em erro."""
+    conn = get_connection()
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def _banco_ocupado(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+def _com_retry(func):
+    """Repete a operação com backoff exponencial enquanto o banco estiver ocupado."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = DB_RETRY_BASE_DELAY
+        for attempt in range(DB_MAX_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _banco_ocupado(e) or attempt == DB_MAX_RETRIES:
+                    raise
+                time.sleep(delay + random.uniform(0, delay))
+                delay *= 2
+    return wrapper
+
+@_com_retry
 def init_db():
-    """Inicializa o banco e realiza migrações de schema se necessário."""
-    os.makedirs("data", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Criação inicial (schema mínimo)
+    """Inicializa o banco e realiza migrações de schema se necessário.
+
+    Schema: ``files`` guarda um arquivo processado (metadata e análise) e
+    ``rows`` guarda um registro por linha (JSON), ligado ao arquivo por
+    ``file_id``. Bancos no formato antigo (tabela ``dados`` com o conteúdo
+    inteiro em um único JSON) são migrados automaticamente.
+    """
+    with transacao() as cursor:
+        _criar_schema(cursor)
+
+def _criar_schema(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            file_name TEXT,
+            file_hash TEXT,
+            file_type TEXT,
+            metadata TEXT,
+            analise_campos TEXT,
+            processed_at TEXT
+        )
+        """
+    )
     cursor.execute(
         """
-        CREATE TABLE IF NOT EXISTS dados (
+        CREATE TABLE IF NOT EXISTS rows (
             id INTEGER PRIMARY KEY,
-            conteudo TEXT,
-            analise_campos TEXT
+            file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+            row_index INTEGER NOT NULL,
+            conteudo TEXT
         )
         """
     )
+    # Índice composto: filtra por arquivo e permite leitura por faixa de linhas
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rows_file_id ON rows (file_id, row_index)"
+    )
 
-    # Verifica colunas existentes
-    cursor.execute("PRAGMA table_info(dados)")
+    # Índice para a busca de duplicatas por hash antes do processamento
+    if UNIQUE_FILE_HASH:
+        try:
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_files_file_hash ON files (file_hash)"
+            )
+        except sqlite3.IntegrityError:
+            # Já existem duplicatas no banco: mantém índice não único
+            pass
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_file_hash ON files (file_hash)")
+
+    # Totais persistidos na inserção: a listagem de arquivos não lê ``rows``
+    cursor.execute("PRAGMA table_info(files)")
     existing_cols = {row[1] for row in cursor.fetchall()}
+    for col in ("record_count", "byte_size"):
+        if col not in existing_cols:
+            cursor.execute(f"ALTER TABLE files ADD COLUMN {col} INTEGER")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_files_processed_at ON files (processed_at DESC)"
+    )
 
-    # Migrações incrementais: adiciona colunas se não existirem
-    migrations = [
-        ("file_name", "ALTER TABLE dados ADD COLUMN file_name TEXT"),
-        ("file_hash", "ALTER TABLE dados ADD COLUMN file_hash TEXT"),
-        ("file_type", "ALTER TABLE dados ADD COLUMN file_type TEXT"),
-        ("metadata", "ALTER TABLE dados ADD COLUMN metadata TEXT"),
-        ("processed_at", "ALTER TABLE dados ADD COLUMN processed_at TEXT"),
-    ]
-    for col, stmt in migrations:
+    # Cache persistente de hashes de arquivos, válido enquanto o arquivo não mudar
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            path TEXT,
+            algorithm TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            digest TEXT,
+            updated_at REAL,
+            PRIMARY KEY (path, algorithm)
+        )
+        """
+    )
+    # Descarte das entradas mais antigas sem percorrer a tabela inteira
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fingerprints_updated_at ON fingerprints (updated_at)"
+    )
+
+    # Versão dos dados: incrementada a cada inserção/remoção de arquivos, invalida
+    # o resumo em cache (inclusive o de outros processos)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )
+        """
+    )
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, versao) VALUES (1, 0)")
+
+    # Cache persistente de respostas do LLM (chave: pergunta normalizada, modelo e versão dos dados)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            chave TEXT PRIMARY KEY,
+            query TEXT,
+            model TEXT,
+            versao INTEGER,
+            resposta TEXT,
+            created_at REAL,
+            accessed_at REAL
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    _migrar_dados_legados(cursor)
+    _preencher_totais(cursor)
+    if FTS_ENABLED:
+        _criar_indice_textual(cursor)
+
+def _criar_indice_textual(cursor):
+    """Cria ``chunks`` (trechos de texto por faixa de linhas) e o índice FTS5 ``chunks_fts``.
+
+    ``chunks_fts`` usa ``chunks`` como tabela de conteúdo externo e é mantido
+    por triggers, então remover trechos de ``chunks`` atualiza o índice. Na
+    primeira criação, os arquivos já existentes são indexados.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'")
+    existia = cursor.fetchone() is not None
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+            row_start INTEGER NOT NULL,
+            row_end INTEGER NOT NULL,
+            texto TEXT NOT NULL
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_id ON chunks (file_id)")
+    try:
+        cursor.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                texto, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        # SQLite sem FTS5: a busca de trechos fica indisponível
+        return
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+            INSERT INTO chunks_fts (rowid, texto) VALUES (new.id, new.texto);
+        END
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+            INSERT INTO chunks_fts (chunks_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+        END
+        """
+    )
+    if not existia:
+        cursor.execute("SELECT id FROM files")
+        for (file_id,) in cursor.fetchall():
+            cursor.execute(
+                "SELECT row_index, conteudo FROM rows WHERE file_id = ? ORDER BY row_index",
+                (file_id,),
+            )
+            _indexar_linhas(
+                cursor, file_id, ((i, json.loads(c)) for i, c in cursor.fetchall())
+            )
+
+def _migrar_dados_legados(cursor):
+    """Divide os blobs da tabela antiga ``dados`` (e ``dados_chunks``) em ``files``/``rows``.
+
+    Os ids são preservados. A migração roda uma única vez: ao final as tabelas
+    antigas são removidas.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'dados'")
+    if not cursor.fetchone():
+        return
+
+    # Bancos muito antigos podem não ter as colunas de identificação
+    cursor.execute("PRAGMA table_info(dados)")
+    existing_cols = {row[1] for row in cursor.fetchall()}
+    for col in ("file_name", "file_hash", "file_type", "metadata", "processed_at"):
         if col not in existing_cols:
-            cursor.execute(stmt)
+            cursor.execute(f"ALTER TABLE dados ADD COLUMN {col} TEXT")
+    cursor.execute("CREATE TABLE IF NOT EXISTS dados_chunks (dado_id INTEGER, chunk_index INTEGER, conteudo TEXT)")
+
+    cursor.execute(
+        """
+        INSERT INTO files (id, file_name, file_hash, file_type, metadata, analise_campos, processed_at)
+        SELECT id, file_name, file_hash, file_type, metadata, analise_campos, processed_at FROM dados
+        """
+    )
+    cursor.execute("SELECT id FROM dados")
+    for (dado_id,) in cursor.fetchall():
+        cursor.execute("SELECT conteudo FROM dados WHERE id = ?", (dado_id,))
+        (conteudo,) = cursor.fetchone()
+        if conteudo:
+            blobs = [conteudo]
+        else:
+            cursor.execute(
+                "SELECT conteudo FROM dados_chunks WHERE dado_id = ? ORDER BY chunk_index",
+                (dado_id,),
+            )
+            blobs = [chunk for (chunk,) in cursor.fetchall()]
+        row_index = 0
+        for blob in blobs:
+            records = _como_lista(json.loads(blob))
+            cursor.executemany(
+                "INSERT INTO rows (file_id, row_index, conteudo) VALUES (?, ?, ?)",
+                (
+                    (dado_id, row_index + i, _json_registro(record))
+                    for i, record in enumerate(records)
+                ),
+            )
+            row_index += len(records)
+
+    cursor.execute("DROP TABLE dados_chunks")
+    cursor.execute("DROP TABLE dados")
+
+def _preencher_totais(cursor):
+    """Calcula record_count/byte_size (e campos de identificação vindos da metadata)
+    dos arquivos inseridos antes dessas colunas existirem."""
+    cursor.execute(
+        """
+        UPDATE files SET
+            record_count = (SELECT COUNT(*) FROM rows WHERE rows.file_id = files.id),
+            byte_size = (
+                SELECT COALESCE(SUM(LENGTH(CAST(conteudo AS BLOB))), 0)
+                FROM rows WHERE rows.file_id = files.id
+            )
+        WHERE record_count IS NULL
+        """
+    )
+    for col in ("file_name", "file_hash", "file_type", "processed_at"):
+        cursor.execute(
+            f"""
+            UPDATE files SET {col} = json_extract(metadata, '$.{col}')
+            WHERE {col} IS NULL AND json_valid(metadata)
+            """
+        )
+
+def _como_lista(conteudo: Any) -> List[Any]:
+    """Normaliza o conteúdo para uma lista de registros (objeto único vira lista de 1)."""
+    if conteudo is None:
+        return []
+    return conteudo if isinstance(conteudo, list) else [conteudo]
+
+def _inserir_arquivo(cursor, analise_campos, metadata) -> int:
+    metadata = metadata if isinstance(metadata, dict) else {}
+    cursor.execute(
+        """
+        INSERT INTO files (file_name, file_hash, file_type, metadata, analise_campos, processed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            metadata.get("file_name"),
+            metadata.get("file_hash"),
+            metadata.get("file_type"),
+            json.dumps(metadata, ensure_ascii=False) if metadata else None,
+            json.dumps(analise_campos, ensure_ascii=False) if analise_campos else None,
+            metadata.get("processed_at"),
+        ),
+    )
+    return cursor.lastrowid
+
+def _sem_nao_finitos(valor: Any) -> Any:
+    """Troca NaN/Infinito por None (recursivamente em dicts e listas)."""
+    if isinstance(valor, float):
+        return valor if math.isfinite(valor) else None
+    if isinstance(valor, dict):
+        return {chave: _sem_nao_finitos(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sem_nao_finitos(v) for v in valor]
+    return valor
+
+def _json_registro(record: Any) -> str:
+    """JSON estrito do registro: valores ausentes (NaN) viram ``null``.
+
+    ``json.dumps`` escreveria ``NaN``, que o ``json_extract`` do SQLite
+    rejeita (as consultas do modo SQL falhariam com "malformed JSON").
+    """
+    try:
+        return json.dumps(record, ensure_ascii=False, allow_nan=False)
+    except ValueError:
+        return json.dumps(_sem_nao_finitos(record), ensure_ascii=False, allow_nan=False)
+
+def _inserir_linhas(
+    cursor, file_id: int, records: List[Any], start_index: int = 0
+) -> Tuple[int, int]:
+    """Insere os registros em ``rows``; retorna (quantidade, bytes do JSON gravado).
+
+    Dentro de um span de :class:`StageTimer`, o tempo de serialização JSON é
+    somado à sub-etapa ``serialize_json``.
+    """
+    totais = [0, 0, 0.0]
+    timer = current_timer()
+
+    def linhas():
+        for i, record in enumerate(records):
+            if timer is not None:
+                inicio = time.perf_counter()
+                texto = _json_registro(record)
+                totais[2] += time.perf_counter() - inicio
+            else:
+                texto = _json_registro(record)
+            totais[0] += 1
+            totais[1] += len(texto.encode("utf-8"))
+            yield (file_id, start_index + i, texto)
+
+    cursor.executemany(
+        "INSERT INTO rows (file_id, row_index, conteudo) VALUES (?, ?, ?)", linhas()
+    )
+    if timer is not None:
+        timer.add("serialize_json", totais[2], rows_out=totais[0])
+    if FTS_ENABLED:
+        _indexar_linhas(cursor, file_id, enumerate(records, start_index))
+    return totais[0], totais[1]
+
+def _texto_do_registro(record: Any) -> str:
+    """Achata um registro em texto pesquisável (``chave: valor`` para dicts)."""
+    if isinstance(record, dict):
+        return " ".join(
+            f"{chave}: {_texto_do_registro(valor)}" for chave, valor in record.items()
+            if valor is not None and valor == valor
+        )
+    if isinstance(record, (list, tuple)):
+        return " ".join(_texto_do_registro(valor) for valor in record)
+    return "" if record is None else str(record)
 
-    conn.commit()
-    conn.close()
+_ESPACOS = re.compile(r"\s*")
 
+def _dividir_texto(texto: str) -> List[str]:
+    """Divide textos longos em partes de até ``FTS_CHUNK_CHARS``, em espaços quando possível.
+
+    Percorre o texto por índices (sem recortar o restante a cada parte), em tempo linear.
+    """
+    partes = []
+    inicio, fim = 0, len(texto)
+    while fim - inicio > FTS_CHUNK_CHARS:
+        corte = texto.rfind(" ", inicio, inicio + FTS_CHUNK_CHARS)
+        if corte <= inicio:
+            corte = inicio + FTS_CHUNK_CHARS
+        partes.append(texto[inicio:corte])
+        inicio = _ESPACOS.match(texto, corte).end()
+    if inicio < fim:
+        partes.append(texto[inicio:])
+    return partes
+
+def _indexar_linhas(cursor, file_id: int, linhas: Iterable[Tuple[int, Any]]):
+    """Grava os trechos de texto dos registros em ``chunks`` (e, por trigger, no FTS).
+
+    Registros curtos consecutivos são agrupados em um trecho; registros longos
+    são divididos em vários trechos com a mesma faixa de linhas.
+    """
+    def trechos():
+        buffer, inicio, fim, tamanho = [], None, None, 0
+        for row_index, record in linhas:
+            texto = _texto_do_registro(record).strip()
+            if not texto:
+                continue
+            if len(texto) > FTS_CHUNK_CHARS:
+                if buffer:
+                    yield (file_id, inicio, fim, "\n".join(buffer))
+                    buffer, tamanho = [], 0
+                for parte in _dividir_texto(texto):
+                    yield (file_id, row_index, row_index, parte)
+                continue
+            if buffer and tamanho + len(texto) > FTS_CHUNK_CHARS:
+                yield (file_id, inicio, fim, "\n".join(buffer))
+                buffer, tamanho = [], 0
+            if not buffer:
+                inicio = row_index
+            buffer.append(texto)
+            fim = row_index
+            tamanho += len(texto) + 1
+        if buffer:
+            yield (file_id, inicio, fim, "\n".join(buffer))
+
+    cursor.executemany(
+        "INSERT INTO chunks (file_id, row_start, row_end, texto) VALUES (?, ?, ?, ?)", trechos()
+    )
+
+def _gravar_totais(cursor, file_id: int, record_count: int, byte_size: int):
+    cursor.execute(
+        "UPDATE files SET record_count = ?, byte_size = ? WHERE id = ?",
+        (record_count, byte_size, file_id),
+    )
+
+@_com_retry
 def inserir_dado(
     conteudo: Any,
     analise_campos: Optional[Dict[str, Any]] = None,
     metadata: Optional[Dict[str, Any]] = None,
-):
-    """Insere um registro no banco incluindo metadata e campos de identificação.
+    substituir: bool = False,
+) -> int:
+    """Insere um arquivo no banco: metadata em ``files`` e uma linha em ``rows`` por registro.
 
     Parameters
     ----------
     conteudo : Any
-        Conteúdo principal (lista de registros ou outro objeto) será serializado em JSON.
+        Conteúdo principal: lista de registros (um objeto único é gravado como uma linha).
     analise_campos : dict | None
         Análise estatística gerada pelo formatter.
     metadata : dict | None
         Metadados do arquivo (file_name, file_hash, file_type, processed_at, etc.).
-    """
-    file_name = None
-    file_hash = None
-    file_type = None
-    processed_at = None
-    if metadata and isinstance(metadata, dict):
-        file_name = metadata.get("file_name")
-        file_hash = metadata.get("file_hash")
-        file_type = metadata.get("file_type")
-        processed_at = metadata.get("processed_at")
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO dados (conteudo, analise_campos, file_name, file_hash, file_type, metadata, processed_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            json.dumps(conteudo, ensure_ascii=False),
-            json.dumps(analise_campos, ensure_ascii=False) if analise_campos else None,
-            file_name,
-            file_hash,
-            file_type,
-            json.dumps(metadata, ensure_ascii=False) if metadata else None,
-            processed_at,
-        ),
-    )
-    conn.commit()
-    conn.close()
-
-def ler_dados() -> List[Dict[str, Any]]:
-    """Lê todos os dados do banco, retornando como objetos Python."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, conteudo, analise_campos, file_name, file_hash, file_type, metadata, processed_at FROM dados"
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    result = []
-    for (
-        id_,
-        conteudo,
-        analise,
-        file_name,
-        file_hash,
-        file_type,
-        metadata,
-        processed_at,
-    ) in rows:
-        parsed_conteudo = json.loads(conteudo) if conteudo else None
-        result.append(
-            {
-                "id": id_,
-                "conteudo": parsed_conteudo,
-                "analise_campos": json.loads(analise) if analise else None,
-                "file_name": file_name,
-                "file_hash": file_hash,
-                "file_type": file_type,
-                "metadata": json.loads(metadata) if metadata else None,
-                "processed_at": processed_at,
-                "record_count": len(parsed_conteudo)
-                if isinstance(parsed_conteudo, list)
-                else (1 if parsed_conteudo else 0),
-            }
-        )
-    return result
+    substituir : bool
+        Remove, na mesma transação, as versões anteriores com o mesmo ``file_hash``
+        (se a inserção falhar, a versão anterior é mantida).
 
-def listar_arquivos() -> List[Dict[str, Any]]:
-    """Lista arquivos processados com contagem de registros."""
-    dados = ler_dados()
-    arquivos = []
-    for d in dados:
-        arquivos.append(
-            {
-                "id": d["id"],
-                "file_name": d.get("file_name") or (d.get("metadata", {}) or {}).get("file_name"),
-                "file_hash": d.get("file_hash") or (d.get("metadata", {}) or {}).get("file_hash"),
-                "file_type": d.get("file_type") or (d.get("metadata", {}) or {}).get("file_type"),
-                "processed_at": d.get("processed_at") or (d.get("metadata", {}) or {}).get("processed_at"),
-                "record_count": d.get("record_count", 0),
-            }
-        )
-    # Ordena por processed_at desc se disponível
-    arquivos.sort(key=lambda x: x.get("processed_at") or "", reverse=True)
-    return arquivos
+    Returns
+    -------
+    int
+        Id do arquivo inserido em ``files``.
+    """
+    with transacao() as cursor:
+        if substituir:
+            _deletar_versoes_anteriores(cursor, metadata)
+        file_id = _inserir_arquivo(cursor, analise_campos, metadata)
+        record_count, byte_size = _inserir_linhas(cursor, file_id, _como_lista(conteudo))
+        _gravar_totais(cursor, file_id, record_count, byte_size)
+        _invalidar_resumo(cursor)
+    return file_id
 
-def deletar_arquivo_por_id(registro_id: int) -> bool:
-    """Remove um registro (arquivo) do banco pelo id. Retorna True se removeu."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM dados WHERE id = ?", (registro_id,))
-    changes = cursor.rowcount
-    conn.commit()
-    conn.close()
-    return changes > 0
+def inserir_dado_em_lotes(
+    chunks: Iterable[List[Any]],
+    analise_provider: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    substituir: bool = False,
+) -> int:
+    """Insere um arquivo cujo conteúdo chega em blocos, sem montá-lo na memória.
 
-def deletar_por_hash(file_hash: str) -> int:
-    """Remove todos registros associados a um file_hash. Retorna quantidade removida."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM dados WHERE file_hash = ?", (file_hash,))
-    changes = cursor.rowcount
-    conn.commit()
-    conn.close()
-    return changes
+    Os registros de cada bloco são gravados em ``rows`` à medida que chegam; a
+    análise é obtida de ``analise_provider`` depois de consumidos todos os
+    blocos. Tudo roda em uma única transação (sem novas tentativas, pois os
+    blocos não podem ser relidos), inclusive a remoção das versões anteriores
+    com ``substituir``. Retorna o id do arquivo inserido.
+    """
+    with transacao() as cursor:
+        if substituir:
+            _deletar_versoes_anteriores(cursor, metadata)
+        file_id = _inserir_arquivo(cursor, None, metadata)
+        total = 0
+        total_bytes = 0
+        for chunk in chunks:
+            count, byte_size = _inserir_linhas(cursor, file_id, chunk, total)
+            total += count
+            total_bytes += byte_size
+        _gravar_totais(cursor, file_id, total, total_bytes)
+        analise_campos = analise_provider() if analise_provider else None
+        if analise_campos:
+            cursor.execute(
+                "UPDATE files SET analise_campos = ? WHERE id = ?",
+                (json.dumps(analise_campos, ensure_ascii=False), file_id),
+            )
+        _invalidar_resumo(cursor)
+    return file_id
 
-def obter_registro(registro_id: int) -> Optional[Dict[str, Any]]:
-    """Obtém um registro completo (incluindo conteudo e analise_campos) pelo id."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _ler_conteudo(cursor, file_id: int, inicio: int = 0, limite: Optional[int] = None) -> List[Any]:
     cursor.execute(
         """
-        SELECT id, conteudo, analise_campos, file_name, file_hash, file_type, metadata, processed_at
-        FROM dados WHERE id = ?
+        SELECT conteudo FROM rows
+        WHERE file_id = ? AND row_index >= ?
+        ORDER BY row_index
+        LIMIT ?
         """,
-        (registro_id,),
+        (file_id, inicio, -1 if limite is None else limite),
     )
-    row = cursor.fetchone()
-    conn.close()
-    if not row:
-        return None
+    return [json.loads(conteudo) for (conteudo,) in cursor.fetchall()]
+
+def _montar_registro(cursor, row) -> Dict[str, Any]:
     (
         id_,
-        conteudo,
         analise,
         file_name,
         file_hash,
         file_type,
         metadata,
         processed_at,
+        byte_size,
     ) = row
-    parsed_conteudo = json.loads(conteudo) if conteudo else None
+    parsed_conteudo = _ler_conteudo(cursor, id_)
     return {
         "id": id_,
         "conteudo": parsed_conteudo,
@@ -198,8 +606,352 @@ def obter_registro(registro_id: int) -> Optional[Dict[str, Any]]:
         "file_type": file_type,
         "metadata": json.loads(metadata) if metadata else None,
         "processed_at": processed_at,
-        "record_count": len(parsed_conteudo)
-        if isinstance(parsed_conteudo, list)
-        else (1 if parsed_conteudo else 0),
+        "record_count": len(parsed_conteudo),
+        "byte_size": byte_size,
     }
 
+@_com_retry
+def ler_dados() -> List[Dict[str, Any]]:
+    """Lê todos os dados do banco, retornando como objetos Python."""
+    cursor = get_connection().cursor()
+    cursor.execute(
+        "SELECT id, analise_campos, file_name, file_hash, file_type, metadata, processed_at, byte_size FROM files"
+    )
+    files = cursor.fetchall()
+    return [_montar_registro(cursor, row) for row in files]
+
+@_com_retry
+def ler_linhas(file_id: int, inicio: int = 0, limite: Optional[int] = None) -> List[Any]:
+    """Lê os registros de um arquivo a partir da linha ``inicio`` (0-based), até ``limite`` linhas."""
+    return _ler_conteudo(get_connection().cursor(), file_id, inicio, limite)
+
+@_com_retry
+def contar_linhas(file_id: int) -> int:
+    """Retorna a quantidade de registros (linhas) de um arquivo."""
+    cursor = get_connection().execute(
+        "SELECT COUNT(*) FROM rows WHERE file_id = ?", (file_id,)
+    )
+    return cursor.fetchone()[0]
+
+@_com_retry
+def buscar_por_hash(file_hash: str) -> Optional[int]:
+    """Retorna o id do arquivo já inserido com o file_hash informado, ou None."""
+    cursor = get_connection().execute(
+        "SELECT id FROM files WHERE file_hash = ? LIMIT 1", (file_hash,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+@_com_retry
+def listar_arquivos() -> List[Dict[str, Any]]:
+    """Lista arquivos processados (mais recentes primeiro) com contagem de registros.
+
+    Lê apenas colunas de ``files``; o conteúdo em ``rows`` não é acessado.
+    """
+    cursor = get_connection().execute(
+        """
+        SELECT id, file_name, file_hash, file_type, processed_at, record_count, byte_size
+        FROM files
+        ORDER BY processed_at DESC
+        """
+    )
+    return [
+        {
+            "id": id_,
+            "file_name": file_name,
+            "file_hash": file_hash,
+            "file_type": file_type,
+            "processed_at": processed_at,
+            "record_count": record_count or 0,
+            "byte_size": byte_size or 0,
+        }
+        for id_, file_name, file_hash, file_type, processed_at, record_count, byte_size in cursor
+    ]
+
+@_com_retry
+def deletar_arquivo_por_id(registro_id: int) -> bool:
+    """Remove um arquivo (e suas linhas) do banco pelo id. Retorna True se removeu."""
+    with transacao() as cursor:
+        _deletar_trechos(cursor, "file_id = ?", (registro_id,))
+        cursor.execute("DELETE FROM rows WHERE file_id = ?", (registro_id,))
+        cursor.execute("DELETE FROM files WHERE id = ?", (registro_id,))
+        changes = cursor.rowcount
+        if changes:
+            _invalidar_resumo(cursor)
+    return changes > 0
+
+def _deletar_hash(cursor, file_hash: str) -> int:
+    _deletar_trechos(cursor, "file_id IN (SELECT id FROM files WHERE file_hash = ?)", (file_hash,))
+    cursor.execute(
+        "DELETE FROM rows WHERE file_id IN (SELECT id FROM files WHERE file_hash = ?)",
+        (file_hash,),
+    )
+    cursor.execute("DELETE FROM files WHERE file_hash = ?", (file_hash,))
+    return cursor.rowcount
+
+def _deletar_versoes_anteriores(cursor, metadata: Optional[Dict[str, Any]]):
+    file_hash = (metadata or {}).get("file_hash")
+    if file_hash:
+        _deletar_hash(cursor, file_hash)
+
+@_com_retry
+def deletar_por_hash(file_hash: str) -> int:
+    """Remove todos arquivos associados a um file_hash. Retorna quantidade removida."""
+    with transacao() as cursor:
+        changes = _deletar_hash(cursor, file_hash)
+        if changes:
+            _invalidar_resumo(cursor)
+    return changes
+
+def _invalidar_resumo(cursor):
+    """Incrementa a versão dos dados (o resumo em cache passa a ser recalculado)."""
+    cursor.execute("UPDATE data_version SET versao = versao + 1 WHERE id = 1")
+
+@_com_retry
+def obter_versao_dados() -> int:
+    """Versão atual dos dados: muda a cada arquivo inserido ou removido."""
+    row = get_connection().execute("SELECT versao FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+@_com_retry
+def obter_resumo() -> Dict[str, Any]:
+    """Resumo do banco para o caminho de consultas, recalculado só quando os dados mudam.
+
+    Contém totais (arquivos, registros, bytes), totais por tipo de arquivo,
+    os arquivos mais recentes com um resumo do schema (colunas e tipos da
+    análise de campos) e linhas de exemplo. Tudo é calculado com agregações
+    SQL sobre ``files``; com o cache válido, o custo é uma única leitura da
+    versão dos dados.
+    """
+    versao = obter_versao_dados()
+    with _resumo_lock:
+        if _resumo_cache["versao"] == versao:
+            return _resumo_cache["resumo"]
+    resumo = _calcular_resumo(get_connection().cursor())
+    with _resumo_lock:
+        _resumo_cache["versao"] = versao
+        _resumo_cache["resumo"] = resumo
+    return resumo
+
+def _calcular_resumo(cursor) -> Dict[str, Any]:
+    cursor.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(record_count), 0), COALESCE(SUM(byte_size), 0),
+               COALESCE(AVG(byte_size), 0)
+        FROM files
+        """
+    )
+    total_files, total_rows, total_bytes, avg_bytes = cursor.fetchone()
+
+    cursor.execute(
+        """
+        SELECT COALESCE(file_type, '?'), COUNT(*), COALESCE(SUM(record_count), 0),
+               COALESCE(AVG(byte_size), 0)
+        FROM files GROUP BY 1 ORDER BY 2 DESC
+        """
+    )
+    por_tipo = {
+        file_type: {"files": count, "rows": rows, "average_bytes": round(avg, 2)}
+        for file_type, count, rows, avg in cursor.fetchall()
+    }
+
+    # Resumo do schema: "coluna:tipo" a partir de analise_campos.tipos
+    cursor.execute(
+        """
+        SELECT f.id, f.file_name, f.file_type, COALESCE(f.record_count, 0),
+               (SELECT group_concat(t.key || ':' || t.value, ', ')
+                FROM json_each(
+                    CASE WHEN json_valid(f.analise_campos) THEN f.analise_campos END, '$.tipos'
+                ) AS t)
+        FROM files f
+        ORDER BY f.processed_at DESC
+        LIMIT ?
+        """,
+        (RESUMO_MAX_ARQUIVOS,),
+    )
+    arquivos = [
+        {"id": id_, "file_name": name, "file_type": file_type, "rows": rows, "schema": schema or ""}
+        for id_, name, file_type, rows, schema in cursor.fetchall()
+    ]
+
+    amostras = []
+    for arquivo in arquivos[:RESUMO_AMOSTRAS]:
+        cursor.execute(
+            "SELECT conteudo FROM rows WHERE file_id = ? ORDER BY row_index LIMIT 20",
+            (arquivo["id"],),
+        )
+        amostras.append("[" + ", ".join(row[0] for row in cursor.fetchall()) + "]")
+
+    return {
+        "total_files": total_files,
+        "total_rows": total_rows,
+        "total_bytes": total_bytes,
+        "average_file_bytes": round(avg_bytes, 2),
+        "by_type": por_tipo,
+        "files": arquivos,
+        "samples": amostras,
+    }
+
+def _deletar_trechos(cursor, condicao: str, params: tuple):
+    """Remove os trechos indexados dos arquivos (o trigger atualiza o FTS)."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks'")
+    if cursor.fetchone():
+        cursor.execute(f"DELETE FROM chunks WHERE {condicao}", params)
+
+def _expressao_fts(consulta: str) -> Optional[str]:
+    """Converte uma pergunta livre em expressão FTS5 (termos relevantes unidos por OR)."""
+    termos = []
+    for termo in re.findall(r"\w+", consulta.lower()):
+        if (len(termo) > 1 or termo.isdigit()) and termo not in FTS_STOPWORDS and termo not in termos:
+            termos.append(termo)
+    return " OR ".join(f'"{termo}"' for termo in termos) or None
+
+@_com_retry
+def buscar_trechos(consulta: str, limite: int = 20) -> List[Dict[str, Any]]:
+    """Busca os trechos mais relevantes para a consulta (ranking BM25 do FTS5).
+
+    Retorna dicts com ``file_id``, ``file_name``, ``row_start``, ``row_end``,
+    ``texto`` e ``score`` (menor = mais relevante), em ordem de relevância.
+    Sem índice textual ou sem termos pesquisáveis, retorna lista vazia.
+    """
+    expressao = _expressao_fts(consulta or "")
+    if not FTS_ENABLED or not expressao:
+        return []
+    try:
+        cursor = get_connection().execute(
+            """
+            SELECT c.file_id, f.file_name, c.row_start, c.row_end, c.texto, chunks_fts.rank
+            FROM chunks_fts
+            JOIN chunks c ON c.id = chunks_fts.rowid
+            JOIN files f ON f.id = c.file_id
+            WHERE chunks_fts MATCH ?
+            ORDER BY chunks_fts.rank
+            LIMIT ?
+            """,
+            (expressao, limite),
+        )
+    except sqlite3.OperationalError as e:
+        if _banco_ocupado(e):
+            raise
+        return []
+    return [
+        {
+            "file_id": file_id,
+            "file_name": file_name,
+            "row_start": row_start,
+            "row_end": row_end,
+            "texto": texto,
+            "score": score,
+        }
+        for file_id, file_name, row_start, row_end, texto, score in cursor
+    ]
+
+@_com_retry
+def obter_registro(registro_id: int) -> Optional[Dict[str, Any]]:
+    """Obtém um arquivo completo (incluindo conteudo e analise_campos) pelo id."""
+    cursor = get_connection().cursor()
+    cursor.execute(
+        """
+        SELECT id, analise_campos, file_name, file_hash, file_type, metadata, processed_at, byte_size
+        FROM files WHERE id = ?
+        """,
+        (registro_id,),
+    )
+    row = cursor.fetchone()
+    return _montar_registro(cursor, row) if row else None
+
+@_com_retry
+def obter_analise(registro_id: int) -> Optional[Dict[str, Any]]:
+    """Obtém apenas a análise de campos de um arquivo, sem ler seu conteúdo."""
+    cursor = get_connection().execute(
+        "SELECT analise_campos FROM files WHERE id = ?", (registro_id,)
+    )
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+@_com_retry
+def obter_metadata(registro_id: int) -> Optional[Dict[str, Any]]:
+    """Obtém apenas os metadados de um arquivo, sem ler seu conteúdo."""
+    cursor = get_connection().execute(
+        "SELECT metadata FROM files WHERE id = ?", (registro_id,)
+    )
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+@_com_retry
+def obter_fingerprint(
+    path: str, algorithm: str, size: int, mtime_ns: int, inode: int
+) -> Optional[str]:
+    """Retorna o hash em cache do arquivo, se (tamanho, mtime, inode) não mudaram."""
+    cursor = get_connection().execute(
+        """
+        SELECT digest FROM fingerprints
+        WHERE path = ? AND algorithm = ? AND size = ? AND mtime_ns = ? AND inode = ?
+        """,
+        (path, algorithm, size, mtime_ns, inode),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+@_com_retry
+def salvar_fingerprint(
+    path: str, algorithm: str, size: int, mtime_ns: int, inode: int, digest: str
+):
+    """Grava o hash do arquivo no cache, descartando as entradas mais antigas."""
+    with transacao() as cursor:
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO fingerprints
+                (path, algorithm, size, mtime_ns, inode, digest, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (path, algorithm, size, mtime_ns, inode, digest, time.time()),
+        )
+        cursor.execute(
+            """
+            DELETE FROM fingerprints WHERE rowid IN (
+                SELECT rowid FROM fingerprints ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (FINGERPRINT_CACHE_MAX,),
+        )
+
+@_com_retry
+def obter_resposta_cache(chave: str, ttl: float) -> Optional[str]:
+    """Retorna a resposta em cache se gravada há menos de ``ttl`` segundos (e marca o acesso)."""
+    agora = time.time()
+    with transacao() as cursor:
+        cursor.execute(
+            "SELECT resposta FROM llm_cache WHERE chave = ? AND created_at >= ?",
+            (chave, agora - ttl),
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE llm_cache SET accessed_at = ? WHERE chave = ?", (agora, chave))
+    return row[0] if row else None
+
+@_com_retry
+def salvar_resposta_cache(
+    chave: str, query: str, model: str, versao: int, resposta: str, max_entradas: int
+):
+    """Grava a resposta no cache, descartando as de versões antigas dos dados e as menos usadas."""
+    agora = time.time()
+    with transacao() as cursor:
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO llm_cache
+                (chave, query, model, versao, resposta, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (chave, query, model, versao, resposta, agora, agora),
+        )
+        # Respostas de versões anteriores dos dados nunca mais serão lidas
+        cursor.execute("DELETE FROM llm_cache WHERE versao < ?", (versao,))
+        cursor.execute(
+            """
+            DELETE FROM llm_cache WHERE chave IN (
+                SELECT chave FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_entradas,),
+        )
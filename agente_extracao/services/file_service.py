@@ -1,17 +1,35 @@
 import os
+import csv
 import shutil
+import sqlite3
+import hashlib
 import zipfile
 import tempfile
 import mimetypes
+from functools import lru_cache
+from services.db_service import obter_fingerprint, salvar_fingerprint
 from services.logging_service import logging_service
 from pypdf import PdfReader
 
+# Algoritmo de hash dos arquivos (md5, sha256, blake2b, ...). Trocar o algoritmo
+# faz com que arquivos já ingeridos com o anterior não sejam reconhecidos como duplicados.
+HASH_ALGORITHM = os.getenv("FILE_HASH_ALGORITHM", "md5")
+HASH_CHUNK_SIZE = 1024 * 1024
+# Bytes lidos do início do arquivo para detectar o tipo (e para o dialeto CSV)
+SNIFF_HEADER_SIZE = 8192
+SNIFF_CSV_SIZE = 1024
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
 def save_uploaded_file(uploaded_file, save_dir):
-    """Salva arquivo enviado pelo usuário"""
+    """Salva arquivo enviado pelo usuário, calculando o hash durante a cópia"""
     os.makedirs(save_dir, exist_ok=True)
     file_path = os.path.join(save_dir, uploaded_file.name)
+    hasher = hashlib.new(HASH_ALGORITHM)
     with open(file_path, "wb") as f:
-        shutil.copyfileobj(uploaded_file, f)
+        while chunk := uploaded_file.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+    _registrar_fingerprint(file_path, HASH_ALGORITHM, hasher.hexdigest())
     
     # Log do upload
     logging_service.log_file_upload(
@@ -22,6 +40,52 @@ def save_uploaded_file(uploaded_file, save_dir):
     
     return file_path
 
+def calcular_hash_arquivo(file_path, algorithm=None):
+    """Calcula o hash do conteúdo do arquivo, usado para identificar duplicatas.
+
+    A leitura é feita em blocos (memória constante) e o resultado fica em cache
+    (em memória e no banco) enquanto caminho, tamanho, mtime e inode não mudarem.
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    path, size, mtime_ns, inode = _stat_key(file_path)
+    return _hash_cached(path, size, mtime_ns, inode, algorithm)
+
+def _stat_key(file_path):
+    path = os.path.abspath(file_path)
+    stats = os.stat(path)
+    return path, stats.st_size, stats.st_mtime_ns, stats.st_ino
+
+@lru_cache(maxsize=1024)
+def _hash_cached(path, size, mtime_ns, inode, algorithm):
+    try:
+        digest = obter_fingerprint(path, algorithm, size, mtime_ns, inode)
+    except sqlite3.Error:
+        digest = None
+    if digest:
+        return digest
+
+    hasher = hashlib.new(algorithm)
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb') as f:
+        while n := f.readinto(buffer):
+            hasher.update(view[:n])
+    digest = hasher.hexdigest()
+
+    try:
+        salvar_fingerprint(path, algorithm, size, mtime_ns, inode, digest)
+    except sqlite3.Error:
+        pass
+    return digest
+
+def _registrar_fingerprint(file_path, algorithm, digest):
+    """Registra no cache um hash já calculado (ex.: durante a gravação do arquivo)"""
+    path, size, mtime_ns, inode = _stat_key(file_path)
+    try:
+        salvar_fingerprint(path, algorithm, size, mtime_ns, inode, digest)
+    except sqlite3.Error:
+        pass
+
 def detect_file_type(file_path):
     """Detecta o tipo de arquivo baseado na extensão (método simples)"""
     ext = file_path.split(".")[-1].lower()
@@ -30,23 +94,54 @@ def detect_file_type(file_path):
     return None
 
 def detectar_tipo_arquivo(file_path):
-    """Detecta o tipo de arquivo usando mimetypes e análise de conteúdo"""
+    """Detecta o tipo de arquivo pelo conteúdo (assinatura e cabeçalho) e pela extensão.
+
+    Lê apenas os primeiros bytes do arquivo: assinaturas de PDF, ZIP/XLSX e
+    OLE (xls), prólogo XML e, para texto, o dialeto CSV do primeiro KB. PDFs
+    são classificados como texto na primeira página que tiver texto. O
+    resultado fica em cache enquanto o arquivo não mudar.
+    """
+    return _detectar_tipo_cached(*_stat_key(file_path))
+
+@lru_cache(maxsize=1024)
+def _detectar_tipo_cached(path, size, mtime_ns, inode):
+    with open(path, 'rb') as f:
+        header = f.read(SNIFF_HEADER_SIZE)
+
+    if header.startswith(b"%PDF-"):
+        return _classificar_pdf(path)
+    if header.startswith(b"PK\x03\x04"):
+        return "EXCEL" if _zip_e_xlsx(path) else "ZIP"
+    if header.startswith(OLE_SIGNATURE):
+        return "EXCEL"
+
+    text = _decodificar_cabecalho(header)
+    if text is not None:
+        stripped = text.lstrip()
+        if stripped.startswith("<?xml") or (stripped.startswith("<") and path.lower().endswith(".xml")):
+            return "XML"
+        tipo_extensao = _detectar_por_extensao(path)
+        if tipo_extensao != "DESCONHECIDO":
+            return tipo_extensao
+        if _parece_csv(text[:SNIFF_CSV_SIZE]):
+            return "CSV"
+        if stripped.startswith("<"):
+            return "XML"
+        return "DESCONHECIDO"
+
+    return _detectar_por_extensao(path)
+
+def _detectar_por_extensao(file_path):
+    """Detecção pelo mimetype da extensão (usada quando o conteúdo não é conclusivo)"""
     tipo, _ = mimetypes.guess_type(file_path)
-    
+
     if tipo == "text/csv":
         return "CSV"
     elif tipo == "application/xml" or file_path.lower().endswith(".xml"):
         return "XML"
     elif tipo == "application/pdf":
-        # Detecta se é PDF texto ou imagem
-        try:
-            reader = PdfReader(file_path)
-            if any(page.extract_text() for page in reader.pages):
-                return "PDF_TEXTO"
-            else:
-                return "PDF_IMAGEM"
-        except Exception:
-            return "PDF_IMAGEM"
+        # Extensão de PDF sem assinatura válida: não há texto extraível
+        return "PDF_IMAGEM"
     elif tipo == "application/vnd.ms-excel" or tipo == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
         return "EXCEL"
     elif file_path.lower().endswith(".zip"):
@@ -54,6 +149,51 @@ def detectar_tipo_arquivo(file_path):
     else:
         return "DESCONHECIDO"
 
+def _classificar_pdf(file_path):
+    """PDF_TEXTO na primeira página com texto; páginas sem fontes nem XObjects são puladas"""
+    try:
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            resources = page.get("/Resources") or {}
+            if hasattr(resources, "get_object"):
+                resources = resources.get_object()
+            if "/Font" not in resources and "/XObject" not in resources:
+                continue
+            if page.extract_text().strip():
+                return "PDF_TEXTO"
+        return "PDF_IMAGEM"
+    except Exception:
+        return "PDF_IMAGEM"
+
+def _zip_e_xlsx(file_path):
+    try:
+        with zipfile.ZipFile(file_path) as zip_ref:
+            names = set(zip_ref.namelist())
+    except zipfile.BadZipFile:
+        return False
+    return "[Content_Types].xml" in names and "xl/workbook.xml" in names
+
+def _decodificar_cabecalho(header):
+    """Decodifica o cabeçalho como texto (UTF-8/UTF-16 com BOM ou Latin-1); None se binário"""
+    if header.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return header.decode("utf-16", errors="ignore")
+    if b"\x00" in header:
+        return None
+    try:
+        return header.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        # Cabeçalho pode cortar um caractere multibyte no final
+        if e.start >= len(header) - 3:
+            return header[:e.start].decode("utf-8-sig")
+        return header.decode("latin-1")
+
+def _parece_csv(sample):
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return False
+    return dialect.delimiter in sample.splitlines()[0] if sample.splitlines() else False
+
 def get_supported_file_type(file_path):
     """Retorna o tipo de arquivo suportado ou None se não suportado"""
     detected_type = detectar_tipo_arquivo(file_path)
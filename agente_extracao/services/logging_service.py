@@ -1,12 +1,483 @@
+import os
+import re
+import json
+import math
+import time
+import queue
+import atexit
+import multiprocessing
+import multiprocessing.util
 import logging
+import logging.handlers
+import sqlite3
+import threading
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Contadores de processamento exibidos na interface (ordem de exibição)
+METRIC_NAMES = (
+    "total_operations",
+    "successful",
+    "failed",
+    "skipped",
+    "zip_extractions",
+    "batch_operations",
+    "bytes_processed",
+    "rows_processed",
+)
+# Rotação dos arquivos de log: "size" (por tamanho) ou "time" (por período, ver LOG_ROTATION_WHEN)
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024
+LOG_ROTATION_WHEN = os.getenv("LOG_ROTATION_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Formato dos arquivos de log: "text" ou "json" (uma linha JSON por evento)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Arquivo de log de cada logger
+LOG_FILES = {
+    "agente_extracao": "application.log",
+    "file_processing": "file_processing.log",
+    "database": "database.log",
+    "ai_queries": "ai_queries.log",
+}
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formata cada evento como uma linha JSON (ts, logger, level, message).
+
+    O QueueHandler já incorpora o traceback de exceções à mensagem.
+    """
+
+    def format(self, record):
+        return json.dumps({
+            "ts": self.formatTime(record, self.datefmt),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+class _ProcessQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler dos loggers da aplicação.
+
+    No processo principal a fila é consumida pelo listener que grava os
+    arquivos. Workers de pools de processos nunca gravam arquivos (a rotação
+    não é segura entre processos): com o initializer de
+    :meth:`LoggingService.worker_pool_options` enviam os eventos ao processo
+    principal; sem ele (ex.: filho criado por fork sem initializer) só avisos
+    e erros são exibidos no stderr.
+    """
+
+    # Marca usada para reconhecer handlers criados por uma importação anterior do módulo
+    agente_queue_handler = True
+
+    def __init__(self, listener):
+        self._pid = os.getpid()
+        self.listener = listener
+        super().__init__(listener.queue)
+
+    def use_queue(self, worker_queue):
+        """Passa a enviar os eventos para ``worker_queue`` (fila do processo principal)"""
+        if self._pid == os.getpid():
+            # Listener de arquivos criado neste processo (ex.: importação em um worker spawn)
+            _stop_listener(self.listener)
+        self.listener = None
+        self.queue = worker_queue
+        self._pid = os.getpid()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.use_queue(_worker_queue)
+        if self.queue is None:
+            if record.levelno >= logging.WARNING:
+                logging.lastResort.handle(record)
+            return
+        super().emit(record)
+
+def _stop_listener(listener):
+    """Grava o que restou na fila e encerra o listener (se ainda ativo)"""
+    if listener is not None and getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+# Um handler de fila por diretório de logs (por processo); reconfigurar é idempotente
+_queue_handlers = {}
+_setup_lock = threading.Lock()
+# Fila (multiprocessing) do processo principal, quando este processo é um worker de pool
+_worker_queue = None
+
+def _init_worker_logging(worker_queue):
+    """Initializer dos workers: os eventos vão para o processo principal, que grava os arquivos"""
+    global _worker_queue
+    _worker_queue = worker_queue
+    for handler in _queue_handlers.values():
+        handler.use_queue(worker_queue)
+
+def in_pool_worker():
+    """True em workers de pools criados com :meth:`LoggingService.worker_pool_options`"""
+    return _worker_queue is not None
+
+def _build_file_handler(path):
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATION_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+
+def _start_listener(log_dir):
+    """Cria os handlers de arquivo (um por logger, com rotação) e inicia o listener da fila"""
+    if LOG_FORMAT == "json":
+        file_formatter = JsonLinesFormatter(datefmt='%Y-%m-%d %H:%M:%S')
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    handlers = []
+    for logger_name, file_name in LOG_FILES.items():
+        handler = _build_file_handler(log_dir / file_name)
+        handler.setFormatter(file_formatter)
+        handler.addFilter(logging.Filter(logger_name))
+        handlers.append(handler)
+
+    # Console handler para desenvolvimento (apenas o logger da aplicação)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    console_handler.addFilter(logging.Filter("agente_extracao"))
+    handlers.append(console_handler)
+
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), *handlers)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+# Mede o pico de memória de cada etapa com tracemalloc (tem custo; desligado por padrão)
+STAGE_TRACE_MEMORY = os.getenv("STAGE_TRACE_MEMORY", "0") == "1"
+# Razão entre limites consecutivos dos buckets dos histogramas de tempo (erro de ~5% nos percentis)
+HISTOGRAM_BASE = 1.1
+# Percentis calculados a partir dos histogramas
+STAGE_PERCENTILES = (50, 95, 99)
+
+# Timer da etapa em andamento (permite a serviços internos, ex.: db_service, somar sub-etapas)
+_active_timer = contextvars.ContextVar("stage_timer", default=None)
+
+def current_timer():
+    """StageTimer do span em andamento neste contexto (ou None)"""
+    return _active_timer.get()
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class StageTimer:
+    """Tempos por etapa do processamento de um arquivo.
+
+    Cada :meth:`span` mede tempo de parede e de CPU (da thread), bytes de
+    entrada, linhas de saída, pico de memória (com ``STAGE_TRACE_MEMORY``) e
+    o pico de RSS do processo. ``stages`` é um dict serializável, então pode
+    voltar de um worker do pool e ser completado no processo principal.
+    """
+
+    def __init__(self, stages=None):
+        self.stages = dict(stages or {})
+
+    @contextmanager
+    def span(self, stage, bytes_in=None):
+        """Mede o bloco como a etapa ``stage``; o dict devolvido aceita ``rows_out``/``bytes_in``"""
+        span = {"wall_s": 0.0, "cpu_s": 0.0, "bytes_in": bytes_in, "rows_out": None, "peak_mem_bytes": None}
+        if STAGE_TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        token = _active_timer.set(self)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield span
+        finally:
+            span["wall_s"] = time.perf_counter() - wall
+            span["cpu_s"] = time.thread_time() - cpu
+            _active_timer.reset(token)
+            if tracing:
+                span["peak_mem_bytes"] = max(tracemalloc.get_traced_memory()[1] - base, 0)
+            span["max_rss_bytes"] = _max_rss_bytes()
+            self.stages[stage] = span
+
+    def add(self, stage, wall_s, rows_out=0, bytes_in=None):
+        """Acumula uma sub-etapa medida em partes (ex.: serialização JSON bloco a bloco)"""
+        span = self.stages.setdefault(
+            stage, {"wall_s": 0.0, "cpu_s": None, "bytes_in": bytes_in, "rows_out": 0, "peak_mem_bytes": None}
+        )
+        span["wall_s"] += wall_s
+        span["rows_out"] += rows_out
+
+def _bucket(seconds):
+    """Bucket logarítmico do histograma (limite superior ``HISTOGRAM_BASE ** bucket`` ms)"""
+    return math.ceil(math.log(max(seconds * 1000, 1e-3), HISTOGRAM_BASE))
+
+# Na primeira leitura, importa as contagens de eventos anteriores ao store dos logs existentes
+METRICS_BACKFILL = os.getenv("METRICS_BACKFILL", "1") == "1"
+
+class MetricsStore:
+    """Contadores persistidos em SQLite, atualizados à medida que os eventos ocorrem.
+
+    As atualizações entram em uma fila em memória e uma thread as grava em
+    lote (uma transação para tudo o que estiver pendente), então quem
+    registra eventos nunca espera pelo disco. Incrementos são atômicos no
+    banco, então vários processos podem atualizar os mesmos contadores. As
+    leituras esperam as atualizações pendentes deste processo.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+        self._pending = None
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS metrics (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS metrics_meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Histogramas de tempo por tipo de arquivo e etapa, e totais para médias
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_histogram (
+                    file_type TEXT NOT NULL, stage TEXT NOT NULL, bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL, PRIMARY KEY (file_type, stage, bucket)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_totals (
+                    file_type TEXT NOT NULL, stage TEXT NOT NULL, count INTEGER NOT NULL,
+                    wall_s REAL NOT NULL, cpu_s REAL NOT NULL, bytes_in INTEGER NOT NULL,
+                    rows_out INTEGER NOT NULL, peak_mem_bytes INTEGER, PRIMARY KEY (file_type, stage)
+                )
+                """
+            )
+            # Eventos anteriores a este instante só existem nos arquivos de log
+            conn.execute(
+                "INSERT OR IGNORE INTO metrics_meta (key, value) VALUES ('created_at', ?)",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),),
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _enqueue(self, item):
+        if self._writer_pid != os.getpid():
+            with self._writer_lock:
+                # Primeiro uso, ou processo filho (fork), que não herda a thread
+                if self._writer_pid != os.getpid():
+                    self._pending = queue.SimpleQueue()
+                    threading.Thread(target=self._writer, name="metrics-writer", daemon=True).start()
+                    if self._writer_pid is None:
+                        atexit.register(self.flush)
+                    else:
+                        # Processos do multiprocessing saem sem rodar o atexit
+                        multiprocessing.util.Finalize(None, self.flush, exitpriority=10)
+                    self._writer_pid = os.getpid()
+        self._pending.put(item)
+
+    def _writer(self):
+        pending = self._pending
+        while True:
+            batch = [pending.get()]
+            while True:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        flushed = []
+        try:
+            with self._connection() as conn:
+                for kind, *args in batch:
+                    if kind == "increment":
+                        self._write_counts(conn, *args)
+                    elif kind == "stages":
+                        self._write_stages(conn, *args)
+                    else:
+                        flushed.append(args[0])
+        except sqlite3.Error:
+            # Métricas nunca devem interromper o processamento
+            pass
+        finally:
+            for event in flushed:
+                event.set()
+
+    def flush(self, timeout=5):
+        """Espera a gravação das atualizações pendentes deste processo"""
+        if self._writer_pid != os.getpid():
+            return
+        done = threading.Event()
+        self._pending.put(("flush", done))
+        done.wait(timeout)
+
+    def increment(self, **counts):
+        """Soma os valores aos contadores (ex.: ``increment(successful=1, rows_processed=10)``)"""
+        counts = {name: int(value) for name, value in counts.items() if value}
+        if counts:
+            self._enqueue(("increment", counts))
+
+    @staticmethod
+    def _write_counts(conn, counts):
+        conn.executemany(
+            """
+            INSERT INTO metrics (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+            """,
+            counts.items(),
+        )
+
+    def read(self):
+        self.flush()
+        rows = dict(self._connection().execute("SELECT name, value FROM metrics"))
+        return {name: rows.get(name, 0) for name in METRIC_NAMES}
+
+    def record_stages(self, file_type, stages):
+        """Soma os tempos de cada etapa (dict de :class:`StageTimer`) aos histogramas do tipo"""
+        self._enqueue(("stages", file_type or "desconhecido", stages))
+
+    @staticmethod
+    def _write_stages(conn, file_type, stages):
+        for stage, span in stages.items():
+            conn.execute(
+                """
+                INSERT INTO stage_histogram (file_type, stage, bucket, count) VALUES (?, ?, ?, 1)
+                ON CONFLICT (file_type, stage, bucket) DO UPDATE SET count = count + 1
+                """,
+                (file_type, stage, _bucket(span["wall_s"])),
+            )
+            conn.execute(
+                """
+                INSERT INTO stage_totals VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (file_type, stage) DO UPDATE SET
+                    count = count + 1,
+                    wall_s = wall_s + excluded.wall_s,
+                    cpu_s = cpu_s + excluded.cpu_s,
+                    bytes_in = bytes_in + excluded.bytes_in,
+                    rows_out = rows_out + excluded.rows_out,
+                    peak_mem_bytes = MAX(COALESCE(peak_mem_bytes, 0), COALESCE(excluded.peak_mem_bytes, 0))
+                """,
+                (
+                    file_type,
+                    stage,
+                    span["wall_s"],
+                    span.get("cpu_s") or 0.0,
+                    span.get("bytes_in") or 0,
+                    span.get("rows_out") or 0,
+                    span.get("peak_mem_bytes"),
+                ),
+            )
+
+    def read_stages(self):
+        """Percentis (s) e médias por tipo de arquivo e etapa: ``{tipo: {etapa: {...}}}``"""
+        self.flush()
+        conn = self._connection()
+        buckets = {}
+        for file_type, stage, bucket, count in conn.execute(
+            "SELECT file_type, stage, bucket, count FROM stage_histogram ORDER BY file_type, stage, bucket"
+        ):
+            buckets.setdefault((file_type, stage), []).append((bucket, count))
+
+        stats = {}
+        for file_type, stage, count, wall_s, cpu_s, bytes_in, rows_out, peak_mem in conn.execute(
+            "SELECT * FROM stage_totals ORDER BY file_type, stage"
+        ):
+            entry = {"count": count, "mean_s": wall_s / count, "cpu_mean_s": cpu_s / count}
+            histogram = buckets.get((file_type, stage), [])
+            total = sum(c for _, c in histogram)
+            for percentile in STAGE_PERCENTILES:
+                rank, seen = total * percentile / 100, 0
+                for bucket, c in histogram:
+                    seen += c
+                    if seen >= rank:
+                        entry[f"p{percentile}_s"] = HISTOGRAM_BASE ** bucket / 1000
+                        break
+            entry.update(bytes_in=bytes_in, rows_out=rows_out, peak_mem_bytes=peak_mem or None)
+            stats.setdefault(file_type, {})[stage] = entry
+        return stats
+
+    def backfill_from_log(self, log_file):
+        """Importa uma única vez as contagens do log de processamento anteriores ao store.
+
+        Lê o arquivo linha a linha (memória constante); eventos registrados
+        depois da criação do store já estão nos contadores e são ignorados.
+        """
+        meta = dict(self._connection().execute("SELECT key, value FROM metrics_meta"))
+        if "backfilled" in meta or not Path(log_file).exists():
+            return
+
+        counts = dict.fromkeys(METRIC_NAMES, 0)
+        records = re.compile(r"Registros: (\d+)")
+        timestamp = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+        with open(log_file, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                # Linhas de texto começam pelo horário; em JSON ele vem no campo "ts"
+                stamp = timestamp.search(line, 0, 30)
+                if stamp and stamp.group() >= meta["created_at"]:
+                    break
+                if "Processamento concluído" in line:
+                    counts["successful"] += 1
+                    counts["total_operations"] += 1
+                    match = records.search(line)
+                    if match:
+                        counts["rows_processed"] += int(match.group(1))
+                elif "Erro no processamento" in line:
+                    counts["failed"] += 1
+                    counts["total_operations"] += 1
+                elif "Arquivo ignorado" in line:
+                    counts["skipped"] += 1
+                elif "ZIP extraído" in line:
+                    counts["zip_extractions"] += 1
+                elif "processamento em lote" in line:
+                    counts["batch_operations"] += 1
+
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO metrics_meta (key, value) VALUES ('backfilled', ?)",
+                (datetime.now().isoformat(),),
+            )
+            # Outro processo pode ter feito o backfill ao mesmo tempo
+            if cursor.rowcount:
+                conn.executemany(
+                    """
+                    INSERT INTO metrics (name, value) VALUES (?, ?)
+                    ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+                    """,
+                    [(name, value) for name, value in counts.items() if value],
+                )
+
 class LoggingService:
     """Serviço centralizado de logging para a aplicação"""
     
     def __init__(self, log_dir="logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
+        self.metrics = MetricsStore(self.log_dir / 'metrics.db')
+        self._worker_listener = None
         self._setup_loggers()
     
     def _setup_loggers(self):
@@ -32,50 +503,50 @@ class LoggingService:
         self._setup_handlers()
     
     def _setup_handlers(self):
-        """Configura os handlers de logging"""
-        
-        # Formatter padrão
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        # Handler para arquivo geral
-        general_handler = logging.FileHandler(
-            self.log_dir / 'application.log',
-            encoding='utf-8'
-        )
-        general_handler.setFormatter(formatter)
-        self.app_logger.addHandler(general_handler)
-        
-        # Handler para processamento de arquivos
-        file_handler = logging.FileHandler(
-            self.log_dir / 'file_processing.log',
-            encoding='utf-8'
-        )
-        file_handler.setFormatter(formatter)
-        self.file_logger.addHandler(file_handler)
-        
-        # Handler para banco de dados
-        db_handler = logging.FileHandler(
-            self.log_dir / 'database.log',
-            encoding='utf-8'
-        )
-        db_handler.setFormatter(formatter)
-        self.db_logger.addHandler(db_handler)
-        
-        # Handler para AI queries
-        ai_handler = logging.FileHandler(
-            self.log_dir / 'ai_queries.log',
-            encoding='utf-8'
-        )
-        ai_handler.setFormatter(formatter)
-        self.ai_logger.addHandler(ai_handler)
-        
-        # Console handler para desenvolvimento
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        self.app_logger.addHandler(console_handler)
+        """Configura os handlers de logging.
+
+        Os loggers só colocam os eventos em uma fila em memória; uma thread
+        (QueueListener) grava nos arquivos, com rotação por tamanho ou
+        período. Chamadas repetidas (ex.: módulo reimportado pelo Streamlit)
+        reutilizam a mesma fila e não duplicam handlers.
+        """
+        key = str(self.log_dir.resolve())
+        with _setup_lock:
+            handler = _queue_handlers.get(key)
+            if handler is None:
+                handler = _ProcessQueueHandler(_start_listener(self.log_dir))
+                if _worker_queue is not None:
+                    handler.use_queue(_worker_queue)
+                _queue_handlers[key] = handler
+        self._queue_handler = handler
+
+        for logger in (self.app_logger, self.file_logger, self.db_logger, self.ai_logger):
+            for existing in list(logger.handlers):
+                if getattr(existing, "agente_queue_handler", False) and existing is not handler:
+                    logger.removeHandler(existing)
+                    _stop_listener(getattr(existing, "listener", None))
+            if handler not in logger.handlers:
+                logger.addHandler(handler)
+    
+    def worker_pool_options(self):
+        """``initializer``/``initargs`` para ``ProcessPoolExecutor``.
+
+        Os workers enviam seus eventos por uma fila (multiprocessing) ao
+        processo principal, o único que grava e rotaciona os arquivos.
+        """
+        with _setup_lock:
+            if _worker_queue is not None:
+                # Este processo já é um worker: pools aninhados usam a mesma fila
+                worker_queue = _worker_queue
+            else:
+                if self._worker_listener is None:
+                    self._worker_listener = logging.handlers.QueueListener(
+                        multiprocessing.Queue(), self._queue_handler
+                    )
+                    self._worker_listener.start()
+                    atexit.register(_stop_listener, self._worker_listener)
+                worker_queue = self._worker_listener.queue
+        return {"initializer": _init_worker_logging, "initargs": (worker_queue,)}
     
     def log_file_upload(self, filename, file_type, file_size):
         """Log de upload de arquivo"""
@@ -87,17 +558,29 @@ class LoggingService:
         """Log de início de processamento"""
         self.file_logger.info(f"Iniciando processamento: {filename} ({file_type})")
     
-    def log_file_processing_success(self, filename, records_count, processing_time):
+    def log_file_processing_success(self, filename, records_count, processing_time, file_size=None):
         """Log de sucesso no processamento"""
         self.file_logger.info(
             f"Processamento concluído: {filename} | "
             f"Registros: {records_count} | "
             f"Tempo: {processing_time:.2f}s"
         )
+        self.metrics.increment(
+            total_operations=1,
+            successful=1,
+            rows_processed=records_count or 0,
+            bytes_processed=file_size or 0,
+        )
     
     def log_file_processing_error(self, filename, error_message):
         """Log de erro no processamento"""
         self.file_logger.error(f"Erro no processamento: {filename} | Erro: {error_message}")
+        self.metrics.increment(total_operations=1, failed=1)
+    
+    def log_file_processing_skipped(self, filename, reason):
+        """Log de arquivo ignorado (ex.: já processado)"""
+        self.file_logger.info(f"Arquivo ignorado: {filename} | Motivo: {reason}")
+        self.metrics.increment(skipped=1)
     
     def log_zip_extraction(self, zip_filename, extracted_files):
         """Log de extração de ZIP"""
@@ -106,10 +589,12 @@ class LoggingService:
             f"Arquivos: {len(extracted_files)} | "
             f"Lista: {', '.join(extracted_files)}"
         )
+        self.metrics.increment(zip_extractions=1)
     
     def log_batch_processing_start(self, total_files):
         """Log de início de processamento em lote"""
         self.file_logger.info(f"Iniciando processamento em lote: {total_files} arquivos")
+        self.metrics.increment(batch_operations=1)
     
     def log_batch_processing_summary(self, total_files, successful, failed, total_time):
         """Log de resumo do processamento em lote"""
@@ -121,6 +606,14 @@ class LoggingService:
             f"Tempo total: {total_time:.2f}s"
         )
     
+    def log_stage_timings(self, filename, file_type, stages):
+        """Log dos tempos por etapa de um arquivo e registro nos histogramas do tipo"""
+        self.file_logger.debug(
+            f"Etapas: {filename} | "
+            + ", ".join(f"{stage}={span['wall_s']:.3f}s" for stage, span in stages.items())
+        )
+        self.metrics.record_stages(file_type, stages)
+    
     def log_database_operation(self, operation, table, records_count=None):
         """Log de operação de banco de dados"""
         message = f"DB {operation}: {table}"
@@ -128,12 +621,18 @@ class LoggingService:
             message += f" | Registros: {records_count}"
         self.db_logger.info(message)
     
-    def log_ai_query(self, query, response_time, success=True):
-        """Log de query AI"""
+    def log_ai_query(self, query, response_time, success=True, cached=False):
+        """Log de query AI (``cached``: resposta servida pelo cache, sem chamar o LLM)"""
         status = "SUCCESS" if success else "ERROR"
-        self.ai_logger.info(
-            f"AI Query {status}: '{query[:50]}...' | Tempo: {response_time:.2f}s"
-        )
+        message = f"AI Query {status}: '{query[:50]}...' | Tempo: {response_time:.2f}s"
+        if cached:
+            message += " | Cache: HIT"
+        self.ai_logger.info(message)
+    
+    def log_ai_context(self, query, tokens_by_section, budget):
+        """Log dos tokens usados por seção do prompt (``total`` incluído) e do orçamento"""
+        sections = ", ".join(f"{name}={tokens}" for name, tokens in tokens_by_section.items())
+        self.ai_logger.info(f"AI Context: '{query[:50]}...' | Tokens: {sections} | Orçamento: {budget}")
     
     def log_application_start(self):
         """Log de início da aplicação"""
@@ -146,39 +645,32 @@ class LoggingService:
             self.app_logger.exception(exception)
     
     def get_processing_stats(self):
-        """Retorna estatísticas de processamento dos logs"""
+        """Retorna estatísticas de processamento (contadores persistidos, sem ler os logs)"""
         try:
-            log_file = self.log_dir / 'file_processing.log'
-            if not log_file.exists():
-                return {"error": "Log file not found"}
-            
-            with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            stats = {
-                "total_operations": 0,
-                "successful": 0,
-                "failed": 0,
-                "zip_extractions": 0,
-                "batch_operations": 0
-            }
-            
-            for line in lines:
-                if "Processamento concluído" in line:
-                    stats["successful"] += 1
-                    stats["total_operations"] += 1
-                elif "Erro no processamento" in line:
-                    stats["failed"] += 1
-                    stats["total_operations"] += 1
-                elif "ZIP extraído" in line:
-                    stats["zip_extractions"] += 1
-                elif "processamento em lote" in line:
-                    stats["batch_operations"] += 1
-            
-            return stats
+            if METRICS_BACKFILL:
+                self.metrics.backfill_from_log(self.log_dir / 'file_processing.log')
+            return self.metrics.read()
         except Exception as e:
             return {"error": str(e)}
 
+    def get_stage_stats(self):
+        """Percentis p50/p95/p99 e médias de cada etapa do processamento, por tipo de arquivo"""
+        try:
+            return self.metrics.read_stages()
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def export_stage_stats(self, path=None):
+        """Exporta as estatísticas por etapa em JSON (grava em ``path`` se informado) e retorna o texto"""
+        payload = json.dumps(
+            {"generated_at": datetime.now().isoformat(), "stages": self.get_stage_stats()},
+            ensure_ascii=False,
+            indent=2,
+        )
+        if path:
+            Path(path).write_text(payload, encoding="utf-8")
+        return payload
+
 # Instância global do serviço de logging
 logging_service = LoggingService()
 
@@ -0,0 +1,90 @@
+import re
+import threading
+from typing import Dict, Iterator, List, Optional
+
+# Padrões comuns extraídos de textos: nome -> (regex, prioridade). A ordem do
+# dicionário é a ordem das chaves no resultado; quando dois padrões casam na
+# mesma posição vence o de menor prioridade (o mais específico).
+DEFAULT_PATTERNS = {
+    "emails": (r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', 10),
+    "phones": (r'(?:\+55\s?)?(?:\(?\d{2}\)?\s?)?(?:9\s?)?\d{4}[-\s]?\d{4}', 90),
+    "dates": (r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', 70),
+    "cpf": (r'\b\d{3}\.?\d{3}\.?\d{3}[-.]?\d{2}\b', 50),
+    "cnpj": (r'\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}[-.]?\d{2}\b', 40),
+    "money": (r'R\$\s?\d{1,3}(?:\.\d{3})*(?:,\d{2})?', 60),
+    "urls": (r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*)?(?:\?(?:[\w&=%.])*)?(?:#(?:[\w.])*)?', 20),
+    # Chave de acesso de NF-e: 44 dígitos, opcionalmente agrupados de 4 em 4
+    "chave_nfe": (r'\b(?:\d{4}\s?){10}\d{4}\b', 30),
+}
+
+class PatternScanner:
+    """Scanner de padrões em uma única passada sobre o texto.
+
+    Os padrões registrados são combinados, em ordem de prioridade, em uma só
+    alternância compilada com grupos nomeados: ``finditer`` percorre o texto
+    uma vez e ``lastgroup`` indica o tipo de cada match. Cada trecho é
+    reportado com um único tipo, então registrar padrões novos não adiciona
+    varreduras. Padrões registrados não devem conter grupos nomeados.
+    """
+
+    def __init__(self, patterns: Optional[Dict[str, tuple]] = None):
+        self._patterns: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        for name, (pattern, priority) in (patterns or {}).items():
+            self._validate(name, pattern)
+            self._patterns[name] = (pattern, priority)
+        self._combined = self._compile()
+
+    @staticmethod
+    def _validate(name: str, pattern: str):
+        if not name.isidentifier():
+            raise ValueError(f"Nome de padrão inválido: {name}")
+        re.compile(pattern)
+
+    def register(self, name: str, pattern: str, priority: int = 100):
+        """Registra (ou substitui) um padrão; menor ``priority`` vence quando dois padrões casam no mesmo ponto"""
+        self._validate(name, pattern)
+        with self._lock:
+            self._patterns[name] = (pattern, priority)
+            self._combined = self._compile()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._patterns)
+
+    def _compile(self):
+        if not self._patterns:
+            return None
+        ordered = sorted(self._patterns.items(), key=lambda item: item[1][1])
+        return re.compile("|".join(f"(?P<{name}>{pattern})" for name, (pattern, _) in ordered))
+
+    def scan(self, text: str, page_number: Optional[int] = None, offset: int = 0) -> Iterator[Dict]:
+        """Gera os matches do texto como dicts ``kind``, ``value``, ``start``, ``end``, ``page``.
+
+        ``offset`` é somado às posições (ex.: início da página no texto completo).
+        """
+        combined = self._combined
+        if combined is None or not text:
+            return
+        for match in combined.finditer(text):
+            yield {
+                "kind": match.lastgroup,
+                "value": match.group(),
+                "start": offset + match.start(),
+                "end": offset + match.end(),
+                "page": page_number,
+            }
+
+    def extract(self, text: str) -> Dict[str, List[str]]:
+        """Valores encontrados por tipo (apenas tipos com algum match)"""
+        return group_values(self.scan(text), self.names)
+
+def group_values(matches, names: List[str]) -> Dict[str, List[str]]:
+    """Agrupa matches de :meth:`PatternScanner.scan` em ``{tipo: [valores]}``, sem tipos vazios"""
+    grouped = {name: [] for name in names}
+    for match in matches:
+        grouped.setdefault(match["kind"], []).append(match["value"])
+    return {k: v for k, v in grouped.items() if v}
+
+# Instância global com os padrões padrão (compilada uma única vez)
+pattern_scanner = PatternScanner(DEFAULT_PATTERNS)
@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List
+from services import db_service
+
+# Limites das consultas SQL geradas pelo modelo: linhas devolvidas e tempo de execução (s)
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))
+SQL_TIMEOUT = float(os.getenv("SQL_TIMEOUT_S", "5"))
+# Arquivos (mais recentes) expostos como views ``arquivo_<id>``
+SQL_MAX_TABLES = int(os.getenv("SQL_MAX_TABLES", "50"))
+
+# Ações permitidas pelo authorizer: somente leitura
+_ACOES_PERMITIDAS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+_INICIO_CONSULTA = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+class ConsultaInvalida(ValueError):
+    """Consulta recusada pela validação ou pelo sandbox (a mensagem volta para o modelo)."""
+
+def _tabelas(cursor) -> List[Dict[str, Any]]:
+    """Arquivos expostos como views, com as colunas da análise de campos (coluna -> tipo)."""
+    cursor.execute(
+        """
+        SELECT id, file_name, file_type, COALESCE(record_count, 0),
+               CASE WHEN json_valid(analise_campos) THEN json_extract(analise_campos, '$.tipos') END
+        FROM files
+        ORDER BY processed_at DESC
+        LIMIT ?
+        """,
+        (SQL_MAX_TABLES,),
+    )
+    tabelas = []
+    for file_id, file_name, file_type, rows, tipos in cursor.fetchall():
+        colunas = {}
+        if tipos:
+            for coluna, tipo in json.loads(tipos).items():
+                # Nomes com aspas não podem ser usados em caminhos JSON do SQLite
+                if '"' not in coluna and "\\" not in coluna:
+                    colunas[coluna] = tipo
+        tabelas.append({
+            "view": f"arquivo_{file_id}",
+            "file_id": file_id,
+            "file_name": file_name,
+            "file_type": file_type,
+            "rows": rows,
+            "colunas": colunas,
+        })
+    return tabelas
+
+def _caminho_json(coluna: str) -> str:
+    """Literal SQL do caminho JSON da coluna (o nome vem do arquivo: aspas simples são escapadas)."""
+    caminho = '$."' + coluna + '"'
+    return "'" + caminho.replace("'", "''") + "'"
+
+def _criar_views(conn, tabelas):
+    for tabela in tabelas:
+        colunas = "".join(
+            f", json_extract(conteudo, {_caminho_json(coluna)}) AS \"{coluna}\""
+            for coluna in tabela["colunas"]
+        )
+        try:
+            conn.execute(
+                f"CREATE TEMP VIEW \"{tabela['view']}\" AS "
+                f"SELECT row_index{colunas}, conteudo FROM main.rows WHERE file_id = {int(tabela['file_id'])}"
+            )
+        except sqlite3.Error:
+            # Um cabeçalho inesperado não deve derrubar as views dos demais arquivos
+            continue
+
+def _authorizer(action, *_):
+    return sqlite3.SQLITE_OK if action in _ACOES_PERMITIDAS else sqlite3.SQLITE_DENY
+
+def catalogo() -> str:
+    """Descrição das views disponíveis para o modelo (nome, arquivo, linhas e colunas)."""
+    cursor = db_service.get_connection().cursor()
+    linhas = []
+    for tabela in _tabelas(cursor):
+        colunas = ", ".join(f'"{coluna}" ({tipo})' for coluna, tipo in tabela["colunas"].items())
+        linhas.append(
+            f"- {tabela['view']}: arquivo {tabela['file_name']} ({tabela['file_type']}, "
+            f"{tabela['rows']} linhas). Colunas: row_index, {colunas + ', ' if colunas else ''}conteudo (JSON)"
+        )
+    return "\n".join(linhas)
+
+def validar_consulta(sql: str) -> str:
+    """Normaliza e valida a consulta: uma única instrução SELECT/WITH."""
+    sql = (sql or "").strip().rstrip(";").strip()
+    if not sql:
+        raise ConsultaInvalida("Consulta vazia")
+    if not _INICIO_CONSULTA.match(sql):
+        raise ConsultaInvalida("Apenas consultas SELECT (ou WITH ... SELECT) são permitidas")
+    # ";" fora de literais termina uma instrução: haveria mais de uma
+    for posicao, caractere in enumerate(sql):
+        if caractere == ";" and sqlite3.complete_statement(sql[:posicao + 1]):
+            raise ConsultaInvalida("Apenas uma instrução por consulta")
+    return sql
+
+def executar_consulta(sql: str, max_rows: int = None, timeout: float = None) -> Dict[str, Any]:
+    """Executa uma consulta somente leitura sobre os dados ingeridos, em sandbox.
+
+    A consulta roda em uma conexão aberta em modo somente leitura, com um
+    authorizer que permite apenas leituras e funções, e é interrompida após
+    ``timeout`` segundos. Cada arquivo é exposto como a view ``arquivo_<id>``
+    (colunas extraídas do JSON das linhas). Retorna ``columns``, ``rows`` (até
+    ``max_rows``) e ``truncated``; consultas recusadas levantam :class:`ConsultaInvalida`.
+    """
+    sql = validar_consulta(sql)
+    max_rows = max_rows or SQL_MAX_ROWS
+    timeout = timeout or SQL_TIMEOUT
+
+    conn = sqlite3.connect(
+        f"{Path(db_service.DB_PATH).resolve().as_uri()}?mode=ro", uri=True, timeout=db_service.DB_BUSY_TIMEOUT
+    )
+    try:
+        _criar_views(conn, _tabelas(conn.cursor()))
+        conn.set_authorizer(_authorizer)
+        deadline = time.monotonic() + timeout
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+        try:
+            cursor = conn.execute(sql)
+            rows = cursor.fetchmany(max_rows + 1)
+        except (sqlite3.Error, sqlite3.Warning) as e:
+            if time.monotonic() > deadline:
+                raise ConsultaInvalida(f"Consulta excedeu o tempo limite de {timeout:g}s")
+            raise ConsultaInvalida(f"Erro na consulta: {e}")
+        columns = [d[0] for d in cursor.description or []]
+    finally:
+        conn.close()
+
+    return {
+        "columns": columns,
+        "rows": [list(row) for row in rows[:max_rows]],
+        "truncated": len(rows) > max_rows,
+    }
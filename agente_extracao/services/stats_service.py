@@ -0,0 +1,330 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+# Valores distintos contados exatamente por coluna antes de passar às estimativas
+# (HyperLogLog para distintos, contadores limitados para o top-k) no modo aproximado
+STATS_DISTINCT_LIMIT = int(os.getenv("STATS_DISTINCT_LIMIT", "100000"))
+# Tamanho da amostra usada nos quantis do modo aproximado
+STATS_SAMPLE_SIZE = int(os.getenv("STATS_SAMPLE_SIZE", "20000"))
+# Valores mais frequentes reportados por coluna e contadores mantidos para estimá-los
+STATS_TOP_K = 5
+STATS_TOP_CAPACITY = 1000
+# Precisão do HyperLogLog: 2^14 registradores, erro padrão de ~0,8%
+HLL_PRECISION = 14
+QUANTILES = (0.25, 0.5, 0.75)
+# dtype das colunas de texto nesta versão do pandas ("str" no pandas 3, "object" antes)
+TEXT_DTYPE = str(pd.Series([], dtype="str").dtype)
+
+class HyperLogLog:
+    """Estimador de cardinalidade (valores distintos) em memória constante"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """Adiciona valores (repetidos não alteram a estimativa)"""
+        values = np.asarray(values)
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(values)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << width) - 1)
+        rank = (width + 1 - _bit_length(remainder)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+def _bit_length(values):
+    """``int.bit_length`` vetorizado para uint64"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = (values >> np.uint64(shift)) != 0
+        length += mask * shift
+        values = np.where(mask, values >> np.uint64(shift), values)
+    return length + (values != 0)
+
+class _ColumnStats:
+    """Acumulador de uma coluna: nulos, tipo, média/variância (Welford), quantis, distintos e top-k"""
+
+    def __init__(self, exact: bool):
+        self.exact = exact
+        self.dtype: Optional[str] = None
+        self.numeric = True
+        self.count = 0
+        self.nulls = 0
+        self.samples: List[Any] = []
+        # Média e soma dos quadrados dos desvios (Welford/Chan), mínimo e máximo
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # Quantis: todos os valores (exato) ou amostra aleatória uniforme com chaves (aproximado)
+        self.values: List[np.ndarray] = []
+        self.sample_keys = np.empty(0)
+        self.sample_values = np.empty(0)
+        # Distintos e frequências: contagem exata até o limite; depois HLL e contadores limitados
+        self.counts = pd.Series(dtype="int64")
+        self.counts_exact = True
+        self.hll = None if exact else HyperLogLog()
+
+    def update(self, series: pd.Series):
+        non_null = series.dropna()
+        self.nulls += len(series) - len(non_null)
+        if not len(non_null):
+            if self.dtype is None:
+                self.dtype = str(series.dtype)
+            return
+
+        chunk_numeric = _is_numeric(series.dtype)
+        if self.count == 0:
+            self.dtype, self.numeric = str(series.dtype), chunk_numeric
+        elif self.dtype != str(series.dtype):
+            # Blocos com tipos diferentes: números viram float64, o resto object
+            both_numeric = self.numeric and chunk_numeric
+            self.dtype = "float64" if both_numeric else "object"
+            self.numeric = both_numeric
+        self.count += len(non_null)
+
+        if len(self.samples) < 3:
+            self.samples.extend(_valor_json(v) for v in non_null.head(3 - len(self.samples)).tolist())
+
+        if self.numeric:
+            self._update_numeric(non_null.to_numpy(dtype="float64"))
+        else:
+            self._reset_numeric()
+
+        try:
+            counts = non_null.value_counts(sort=False)
+        except TypeError:
+            # Valores não hasheáveis (listas, dicts): contados pela representação textual
+            counts = non_null.astype(str).value_counts(sort=False)
+        self.add_counts(counts)
+
+    def _update_numeric(self, values: np.ndarray):
+        n = len(values)
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._merge_moments(n, mean, m2)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if self.exact:
+            self.values.append(values)
+        else:
+            self._sample(np.random.default_rng().random(n), values)
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.n + n
+        if not total:
+            return
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def _sample(self, keys, values):
+        """Mantém os valores de menor chave aleatória (amostra uniforme, mesclável)"""
+        keys = np.concatenate([self.sample_keys, keys])
+        values = np.concatenate([self.sample_values, values])
+        if len(keys) > STATS_SAMPLE_SIZE:
+            keep = np.argpartition(keys, STATS_SAMPLE_SIZE)[:STATS_SAMPLE_SIZE]
+            keys, values = keys[keep], values[keep]
+        self.sample_keys, self.sample_values = keys, values
+
+    def _reset_numeric(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+        self.values = []
+        self.sample_keys, self.sample_values = np.empty(0), np.empty(0)
+
+    def add_counts(self, counts: pd.Series):
+        """Soma frequências por valor (índice = valor, valores = contagem)"""
+        if self.hll is not None:
+            index = counts.index
+            self.hll.add(index.to_numpy(dtype="float64") if self.numeric else index.to_numpy(dtype=object))
+        if len(self.counts):
+            counts = pd.concat([self.counts, counts]).groupby(level=0, sort=False).sum()
+        if not self.exact and len(counts) > STATS_DISTINCT_LIMIT:
+            self.counts_exact = False
+        if not self.counts_exact and len(counts) > STATS_TOP_CAPACITY:
+            counts = counts.nlargest(STATS_TOP_CAPACITY)
+        self.counts = counts
+
+    def merge(self, other: "_ColumnStats"):
+        if other.count:
+            if self.count == 0:
+                self.dtype, self.numeric = other.dtype, other.numeric
+            elif self.dtype != other.dtype:
+                both_numeric = self.numeric and other.numeric
+                self.dtype = "float64" if both_numeric else "object"
+                self.numeric = both_numeric
+        elif self.dtype is None:
+            self.dtype = other.dtype
+        self.count += other.count
+        self.nulls += other.nulls
+        self.samples = (self.samples + other.samples)[:3]
+
+        if self.numeric and other.numeric:
+            self._merge_moments(other.n, other.mean, other.m2)
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self.values.extend(other.values)
+            self._sample(other.sample_keys, other.sample_values)
+        else:
+            self._reset_numeric()
+
+        if self.hll is not None and other.hll is not None:
+            self.hll.merge(other.hll)
+        self.counts_exact = self.counts_exact and other.counts_exact
+        self.add_counts(other.counts)
+
+    def add_nulls(self, count: int):
+        """Linhas em que a coluna não existe (ex.: planilhas com colunas diferentes)"""
+        self.nulls += count
+        if count and self.dtype in ("int64", "int32"):
+            self.dtype = "float64"
+
+    @property
+    def unique(self) -> int:
+        if self.counts_exact or self.hll is None:
+            return int(len(self.counts))
+        return max(self.hll.estimate(), int(len(self.counts)))
+
+    def top(self, k: int = STATS_TOP_K):
+        if not len(self.counts):
+            return []
+        return [[_valor_json(v), int(c)] for v, c in self.counts.nlargest(k).items()]
+
+    def column_analysis(self) -> Dict[str, Any]:
+        info = {
+            "data_type": self.dtype,
+            "non_null_count": int(self.count),
+            "null_count": int(self.nulls),
+            "unique_values": self.unique,
+            "sample_values": list(self.samples),
+            "top_values": self.top(),
+        }
+        if not self.counts_exact:
+            info["unique_values_approx"] = True
+        return info
+
+    def describe(self) -> Dict[str, Any]:
+        """Estatísticas no formato de ``DataFrame.describe`` (só as chaves que se aplicam)"""
+        stats: Dict[str, Any] = {"count": int(self.count)}
+        if not self.count:
+            return stats
+        if self.numeric and self.n:
+            values = np.concatenate(self.values) if self.exact else self.sample_values
+            quantiles = np.quantile(values, QUANTILES) if len(values) else [None] * len(QUANTILES)
+            stats.update({
+                "mean": self.mean,
+                "std": math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None,
+                "min": self.min,
+                **{f"{int(q * 100)}%": _valor_json(v) for q, v in zip(QUANTILES, quantiles)},
+                "max": self.max,
+            })
+            return stats
+        top = self.top(1)
+        stats["unique"] = self.unique
+        if top:
+            stats["top"], stats["freq"] = top[0]
+        return stats
+
+class DataFrameStats:
+    """Estatísticas de colunas calculadas em uma passada, alimentadas bloco a bloco.
+
+    Cada bloco (DataFrame) passado a :meth:`update` é incorporado aos
+    acumuladores, então o resultado de um arquivo lido em blocos é o mesmo de
+    ler o arquivo inteiro. No modo exato (arquivos pequenos) distintos, top-k
+    e quantis são exatos; no aproximado a memória é limitada: distintos pelo
+    HyperLogLog, top-k por contadores limitados e quantis por amostragem.
+    Instâncias podem ser combinadas com :meth:`merge` (ex.: planilhas).
+    """
+
+    def __init__(self, exact: bool = True):
+        self.exact = exact
+        self.rows = 0
+        self.columns: Dict[Any, _ColumnStats] = {}
+
+    def update(self, df: pd.DataFrame) -> "DataFrameStats":
+        for col in df.columns:
+            column = self.columns.get(col)
+            if column is None:
+                column = self.columns[col] = _ColumnStats(self.exact)
+                column.add_nulls(self.rows)
+            column.update(df[col])
+        for col, column in self.columns.items():
+            if col not in df.columns:
+                column.add_nulls(len(df))
+        self.rows += len(df)
+        return self
+
+    def merge(self, other: "DataFrameStats") -> "DataFrameStats":
+        for col, column in other.columns.items():
+            if col not in self.columns:
+                self.columns[col] = _ColumnStats(self.exact)
+                self.columns[col].add_nulls(self.rows)
+            self.columns[col].merge(column)
+        for col, column in self.columns.items():
+            if col not in other.columns:
+                column.add_nulls(other.rows)
+        self.rows += other.rows
+        return self
+
+    def add_value_counts(self, column, counts: Dict[Any, int], dtype: str = TEXT_DTYPE):
+        """Adiciona uma coluna já agregada (valor -> linhas), ex.: o nome da planilha"""
+        stats = self.columns.setdefault(column, _ColumnStats(self.exact))
+        stats.add_nulls(self.rows - sum(counts.values()))
+        stats.dtype, stats.numeric = dtype, False
+        stats.count += sum(counts.values())
+        stats.samples = [_valor_json(v) for v in list(counts)[:3]]
+        stats.add_counts(pd.Series(counts, dtype="int64"))
+
+    def dtypes(self) -> Dict[Any, str]:
+        return {col: column.dtype for col, column in self.columns.items()}
+
+    def structure_info(self) -> Dict[str, Any]:
+        return {
+            "total_rows": self.rows,
+            "total_columns": len(self.columns),
+            "columns": list(self.columns),
+            "column_analysis": {col: column.column_analysis() for col, column in self.columns.items()},
+        }
+
+    def describe(self) -> Dict[Any, Dict[str, Any]]:
+        return {col: column.describe() for col, column in self.columns.items()}
+
+    def analise(self) -> Dict[str, Any]:
+        """Análise de campos no formato do formatter_agent (tipos, describe, shape)"""
+        return {
+            "tipos": self.dtypes(),
+            "describe": self.describe() if self.rows else {},
+            "shape": (self.rows, len(self.columns)),
+        }
+
+def _is_numeric(dtype) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def _valor_json(value):
+    """Converte escalares numpy/pandas em tipos serializáveis em JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    return value
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import db_service  # noqa: E402
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco vazio em um diretório temporário"""
+    monkeypatch.setattr(db_service, "DB_PATH", str(tmp_path / "banco.db"))
+    db_service.init_db()
+    yield db_service
+    db_service.close_connection()
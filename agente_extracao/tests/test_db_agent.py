@@ -0,0 +1,21 @@
+from agents.db_agent import insert_into_db
+from agents.reader_agent import CsvChunkStream
+
+
+def test_analise_do_streaming_calculada_uma_vez(banco, tmp_path, monkeypatch):
+    caminho = tmp_path / "dados.csv"
+    caminho.write_text("nome,valor\n" + "".join(f"n{i},{i}\n" for i in range(10)), encoding="utf-8")
+    stream = CsvChunkStream(str(caminho), chunk_size=4)
+    chamadas = []
+    analise = stream.analise
+    monkeypatch.setattr(stream, "analise", lambda: chamadas.append(1) or analise())
+
+    resultado = insert_into_db(
+        {"dados": stream, "analise_campos": None},
+        {"file_name": "dados.csv", "file_hash": "h", "file_type": "csv", "processed_at": "2024-01-01T00:00:00"},
+    )
+
+    assert len(chamadas) == 1
+    assert resultado["records"] == 10
+    assert tuple(resultado["analise_campos"]["shape"]) == (10, 2)
+    assert banco.obter_analise(resultado["id"])["tipos"] == resultado["analise_campos"]["tipos"]
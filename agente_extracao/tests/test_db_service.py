@@ -0,0 +1,25 @@
+import pytest
+
+
+def _metadata(file_hash="abc"):
+    return {"file_name": "dados.csv", "file_hash": file_hash, "file_type": "csv", "processed_at": "2024-01-01T00:00:00"}
+
+
+def test_substituir_troca_a_versao_anterior(banco):
+    antigo = banco.inserir_dado([{"v": 1}], None, _metadata())
+
+    novo = banco.inserir_dado([{"v": 2}, {"v": 3}], None, _metadata(), substituir=True)
+
+    assert [a["id"] for a in banco.listar_arquivos()] == [novo]
+    assert banco.obter_analise(antigo) is None
+    assert banco.ler_linhas(novo) == [{"v": 2}, {"v": 3}]
+
+
+def test_substituir_mantem_a_versao_anterior_se_a_insercao_falhar(banco):
+    antigo = banco.inserir_dado([{"v": 1}], None, _metadata())
+
+    with pytest.raises(TypeError):
+        banco.inserir_dado([{"v": object()}], None, _metadata(), substituir=True)
+
+    assert [a["id"] for a in banco.listar_arquivos()] == [antigo]
+    assert banco.ler_linhas(antigo) == [{"v": 1}]
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+
+def _metadata(nome, file_hash):
+    return {"file_name": nome, "file_hash": file_hash, "file_type": "csv", "processed_at": "2024-01-01T00:00:00"}
+
+
+def _arquivos_encontrados(banco, termo):
+    return {trecho["file_id"] for trecho in banco.buscar_trechos(termo)}
+
+
+def _verificar_indice(banco):
+    # rank = 1 compara o índice com a tabela ``chunks``; falha (DatabaseError) se divergirem
+    with banco.transacao() as cursor:
+        cursor.execute("INSERT INTO chunks_fts (chunks_fts, rank) VALUES ('integrity-check', 1)")
+
+
+@pytest.fixture
+def banco_fts(banco):
+    if not banco.FTS_ENABLED:
+        pytest.skip("índice textual desativado")
+    try:
+        banco.get_connection().execute("SELECT 1 FROM chunks_fts LIMIT 1")
+    except sqlite3.OperationalError:
+        pytest.skip("SQLite sem FTS5")
+    return banco
+
+
+def test_substituir_reindexa_o_arquivo(banco_fts):
+    banco = banco_fts
+    antigo = banco.inserir_dado([{"fruta": "abacaxi"}], None, _metadata("frutas.csv", "h1"))
+    outro = banco.inserir_dado([{"fruta": "abacaxi maduro"}], None, _metadata("outro.csv", "h2"))
+    assert _arquivos_encontrados(banco, "abacaxi") == {antigo, outro}
+
+    novo = banco.inserir_dado([{"fruta": "carambola"}], None, _metadata("frutas.csv", "h1"), substituir=True)
+
+    assert _arquivos_encontrados(banco, "abacaxi") == {outro}
+    assert _arquivos_encontrados(banco, "carambola") == {novo}
+    _verificar_indice(banco)
+
+
+def test_remover_arquivo_remove_os_trechos(banco_fts):
+    banco = banco_fts
+    file_id = banco.inserir_dado(
+        [{"texto": f"linha {i} jabuticaba"} for i in range(50)], None, _metadata("a.csv", "h1")
+    )
+    assert _arquivos_encontrados(banco, "jabuticaba") == {file_id}
+
+    assert banco.deletar_arquivo_por_id(file_id)
+
+    assert banco.buscar_trechos("jabuticaba") == []
+    assert banco.get_connection().execute("SELECT COUNT(*) FROM chunks").fetchone() == (0,)
+    _verificar_indice(banco)
+
+
+def test_remover_por_hash_remove_os_trechos(banco_fts):
+    banco = banco_fts
+    banco.inserir_dado([{"fruta": "pitanga"}], None, _metadata("a.csv", "h1"))
+
+    assert banco.deletar_por_hash("h1") == 1
+
+    assert banco.buscar_trechos("pitanga") == []
+    _verificar_indice(banco)
@@ -0,0 +1,13 @@
+from services.logging_service import MetricsStore
+
+
+def test_metricas_gravadas_em_lote_visiveis_na_leitura(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.db")
+    for _ in range(100):
+        store.increment(successful=1, rows_processed=3)
+    store.record_stages("csv", {"ler": {"wall_s": 0.5}})
+
+    metricas = store.read()
+    assert metricas["successful"] == 100
+    assert metricas["rows_processed"] == 300
+    assert store.read_stages()["csv"]["ler"]["count"] == 1
@@ -0,0 +1,54 @@
+import pytest
+
+from services.pattern_service import DEFAULT_PATTERNS, PatternScanner, group_values
+
+
+def test_padrao_mais_especifico_vence_no_mesmo_trecho():
+    scanner = PatternScanner(DEFAULT_PATTERNS)
+    texto = "CNPJ 12.345.678/0001-95, chave 3519 0512 3456 7800 0195 5500 1000 0000 0110 0000 0010"
+
+    tipos = [(m["kind"], m["value"]) for m in scanner.scan(texto)]
+
+    assert tipos == [
+        ("cnpj", "12.345.678/0001-95"),
+        ("chave_nfe", "3519 0512 3456 7800 0195 5500 1000 0000 0110 0000 0010"),
+    ]
+
+
+def test_prioridade_do_padrao_registrado():
+    texto = "ligue 1234-5678"
+    scanner = PatternScanner(DEFAULT_PATTERNS)
+
+    scanner.register("ramal", r"\d{4}-\d{4}", priority=200)
+    assert [m["kind"] for m in scanner.scan(texto)] == ["phones"]
+
+    scanner.register("ramal", r"\d{4}-\d{4}", priority=5)
+    assert [m["kind"] for m in scanner.scan(texto)] == ["ramal"]
+
+
+def test_posicoes_somam_o_deslocamento_da_pagina():
+    scanner = PatternScanner({"dates": DEFAULT_PATTERNS["dates"]})
+
+    (match,) = scanner.scan("em 01/02/2024", page_number=3, offset=100)
+
+    assert match == {"kind": "dates", "value": "01/02/2024", "start": 103, "end": 113, "page": 3}
+
+
+def test_agrupamento_segue_a_ordem_dos_tipos_e_omite_vazios():
+    scanner = PatternScanner(DEFAULT_PATTERNS)
+    texto = "R$ 10,00 em 01/02/2024 e R$ 5,50; contato a@b.com"
+
+    agrupado = scanner.extract(texto)
+
+    assert agrupado == {
+        "emails": ["a@b.com"],
+        "dates": ["01/02/2024"],
+        "money": ["R$ 10,00", "R$ 5,50"],
+    }
+    assert list(agrupado) == [n for n in scanner.names if n in agrupado]
+    assert group_values([], scanner.names) == {}
+
+
+def test_nome_de_padrao_invalido():
+    with pytest.raises(ValueError):
+        PatternScanner().register("nao-e-identificador", r"\d+")
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents import query_agent
+
+
+def test_lote_sem_api_key_devolve_um_erro_por_pergunta(banco, monkeypatch):
+    monkeypatch.delenv("API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    respostas = asyncio.run(query_agent.answer_queries(["quanto?", "qual?"]))
+
+    assert respostas == [query_agent.answer_query("quanto?")] * 2
+    assert respostas[0].startswith("❌")
+
+
+def test_chave_do_cache_normaliza_a_pergunta():
+    chave = query_agent._chave_cache("Qual é o  TOTAL?", "modelo", 1)
+
+    assert query_agent._chave_cache("qual e o total", "modelo", 1) == chave
+    assert query_agent._chave_cache("qual e o total", "outro-modelo", 1) != chave
+    assert query_agent._chave_cache("qual e o total", "modelo", 2) != chave
+
+
+def test_resposta_em_cache_expira_apos_o_ttl(banco):
+    banco.salvar_resposta_cache("k", "pergunta", "m", 1, "resposta", 10)
+    assert banco.obter_resposta_cache("k", ttl=60) == "resposta"
+
+    with banco.transacao() as cursor:
+        cursor.execute("UPDATE llm_cache SET created_at = created_at - 61")
+
+    assert banco.obter_resposta_cache("k", ttl=60) is None
+
+
+def test_cache_descarta_a_menos_usada_e_versoes_antigas(banco):
+    banco.salvar_resposta_cache("a", "a", "m", 1, "A", 2)
+    time.sleep(0.01)
+    banco.salvar_resposta_cache("b", "b", "m", 1, "B", 2)
+    time.sleep(0.01)
+    assert banco.obter_resposta_cache("a", ttl=60) == "A"
+    time.sleep(0.01)
+
+    banco.salvar_resposta_cache("c", "c", "m", 1, "C", 2)
+
+    assert banco.obter_resposta_cache("b", ttl=60) is None
+    assert banco.obter_resposta_cache("a", ttl=60) == "A"
+
+    banco.salvar_resposta_cache("d", "d", "m", 2, "D", 2)
+    assert [banco.obter_resposta_cache(k, ttl=60) for k in "acd"] == [None, None, "D"]
+
+
+def test_resposta_em_cache_vale_ate_os_dados_mudarem(banco, monkeypatch):
+    monkeypatch.delenv("API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(query_agent, "LLM_CACHE_TTL", 60)
+    model = os.getenv("MODEL_NAME", query_agent.DEFAULT_MODEL)
+    chave, versao, _ = query_agent._cache_lookup("Quanto vendemos?", model)
+    query_agent._gravar_cache(chave, "Quanto vendemos?", model, versao, "R$ 10")
+
+    # Sem API key: a resposta só pode vir do cache
+    assert query_agent.answer_query("quanto vendemos") == "R$ 10"
+
+    banco.inserir_dado(
+        [{"v": 1}], None,
+        {"file_name": "a.csv", "file_hash": "h", "file_type": "csv", "processed_at": "2024-01-01T00:00:00"},
+    )
+    assert query_agent.answer_query("quanto vendemos") != "R$ 10"
+
+
+class _StubLLM(BaseHTTPRequestHandler):
+    """Servidor compatível com a API da OpenAI: completions com partes fixas (SSE com ``stream``)"""
+
+    protocol_version = "HTTP/1.1"
+    partes = ["Olá", ", ", "mundo"]
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requisicoes.append({"path": self.path, "corpo": corpo, "porta": self.client_address[1]})
+        if corpo.get("stream"):
+            eventos = [
+                {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": corpo["model"],
+                 "choices": [{"index": 0, "delta": {"content": parte}, "finish_reason": None}]}
+                for parte in self.partes
+            ]
+            resposta = "".join(f"data: {json.dumps(evento)}\n\n" for evento in eventos) + "data: [DONE]\n\n"
+            tipo = "text/event-stream"
+        else:
+            resposta = json.dumps({
+                "id": "1", "object": "chat.completion", "created": 0, "model": corpo["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(self.partes)}}],
+            })
+            tipo = "application/json"
+        resposta = resposta.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_llm(banco, monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLM)
+    servidor.requisicoes = []
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("LLM_BASE_URL", f"http://127.0.0.1:{servidor.server_address[1]}/v1")
+    monkeypatch.setenv("API_KEY", "chave-de-teste")
+    monkeypatch.setenv("MODEL_NAME", "modelo-local")
+    monkeypatch.setattr(query_agent, "LLM_CACHE_TTL", 60)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_stream_repassa_as_partes_do_modelo(stub_llm):
+    partes = list(query_agent.answer_query_stream("Qual o total?"))
+
+    assert partes == _StubLLM.partes
+    (requisicao,) = stub_llm.requisicoes
+    assert requisicao["path"] == "/v1/chat/completions"
+    assert requisicao["corpo"]["stream"] is True
+    assert requisicao["corpo"]["model"] == "modelo-local"
+
+    # A resposta completa fica em cache: a mesma pergunta não chama o modelo
+    assert list(query_agent.answer_query_stream("qual o total")) == ["Olá, mundo"]
+    assert len(stub_llm.requisicoes) == 1
+
+
+def test_cliente_reutilizado_entre_perguntas(stub_llm):
+    cliente = query_agent.get_client()
+
+    assert list(query_agent.answer_query_stream("primeira pergunta")) == _StubLLM.partes
+    assert list(query_agent.answer_query_stream("segunda pergunta")) == _StubLLM.partes
+    assert query_agent.get_client() is cliente
+
+    # Sem streaming a resposta é lida inteira e a conexão volta ao pool do cliente
+    assert query_agent.answer_query("terceira pergunta") == "Olá, mundo"
+    assert query_agent.answer_query("quarta pergunta") == "Olá, mundo"
+    portas = [requisicao["porta"] for requisicao in stub_llm.requisicoes]
+    assert len(portas) == 4 and portas[2] == portas[3]
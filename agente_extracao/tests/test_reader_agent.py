@@ -0,0 +1,80 @@
+import pandas as pd
+
+from agents import reader_agent
+from benchmarks.corpus import write_pdf
+from services import logging_service as logging_module
+
+
+class _PoolRegistrado:
+    """ProcessPoolExecutor síncrono que registra sua criação"""
+
+    criados = 0
+
+    def __init__(self, max_workers, **options):
+        type(self).criados += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+
+def _pools_criados(tmp_path, monkeypatch):
+    caminho = tmp_path / "doc.pdf"
+    write_pdf(caminho, 4, 3)
+    monkeypatch.setattr(reader_agent, "PDF_WORKERS", 2)
+    monkeypatch.setattr(reader_agent, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(reader_agent, "ProcessPoolExecutor", _PoolRegistrado)
+    _PoolRegistrado.criados = 0
+    resultado = reader_agent.read_file(str(caminho), "pdf")
+    assert len(resultado["content"]["pages"]) == 4
+    return _PoolRegistrado.criados
+
+
+def test_pdf_usa_pool_fora_dos_workers_do_lote(tmp_path, monkeypatch):
+    assert _pools_criados(tmp_path, monkeypatch) == 1
+
+
+def test_pdf_nao_abre_pool_dentro_de_um_worker_do_lote(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_module, "_worker_queue", object())
+    assert _pools_criados(tmp_path, monkeypatch) == 0
+
+
+def _planilha(caminho):
+    with pd.ExcelWriter(caminho) as writer:
+        pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "x"]}).to_excel(writer, sheet_name="S1", index=False)
+        pd.DataFrame({"a": [5, 6], "c": [1.5, 2.5]}).to_excel(writer, sheet_name="S2", index=False)
+
+
+def test_excel_grande_e_inserido_em_blocos(banco, tmp_path, monkeypatch):
+    from agents import workflow
+
+    caminho = tmp_path / "grande.xlsx"
+    _planilha(caminho)
+    monkeypatch.setattr(reader_agent, "EXCEL_STREAMING_THRESHOLD", 0)
+    monkeypatch.setattr(reader_agent, "EXCEL_CHUNK_SIZE", 2)
+
+    stream = reader_agent.read_file(str(caminho), "xlsx")["content"]["records_chunks"]
+    assert [len(bloco) for bloco in stream] == [2, 1, 2]
+
+    resultado = workflow.process_file(str(caminho), "xlsx")
+
+    assert resultado["status"] == "success"
+    assert resultado["records"] == 5
+    linhas = banco.ler_linhas(resultado["id"])
+    assert [linha["__sheet__"] for linha in linhas] == ["S1"] * 3 + ["S2"] * 2
+    assert linhas[3] == {"a": 5, "c": 1.5, "__sheet__": "S2"}
+    assert resultado["analise_campos"]["tipos"]["__sheet__"] == "str"
+
+
+def test_coluna_da_planilha_tem_o_dtype_das_colunas_de_texto(tmp_path):
+    caminho = tmp_path / "pequena.xlsx"
+    _planilha(caminho)
+
+    analise = reader_agent.read_file(str(caminho), "xlsx")["content"]["analise_campos"]
+
+    assert analise["tipos"]["__sheet__"] == analise["tipos"]["b"]
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+
+import pytest
+
+from services.sql_service import ConsultaInvalida, executar_consulta
+
+
+def _inserir(banco, linhas, tipos, nome="dados.csv"):
+    return banco.inserir_dado(
+        linhas,
+        {"tipos": tipos},
+        {"file_name": nome, "file_hash": nome, "file_type": "csv", "processed_at": "2024-01-01T00:00:00"},
+    )
+
+
+def test_cabecalho_com_aspas_simples_nao_quebra_as_views(banco):
+    hostil = "x') AS a FROM rows; DROP TABLE files; --"
+    file_id = _inserir(
+        banco,
+        [{"qtd d'água": 2, hostil: 1}, {"qtd d'água": 3, hostil: 1}],
+        {"qtd d'água": "int64", hostil: "int64"},
+    )
+
+    resultado = executar_consulta(f'SELECT SUM("qtd d\'água") FROM arquivo_{file_id}')
+
+    assert resultado["rows"] == [[5]]
+    assert banco.listar_arquivos()
+
+
+def test_soma_ignora_valores_ausentes(banco):
+    file_id = _inserir(
+        banco,
+        [{"valor": 1.5}, {"valor": float("nan")}, {"valor": float("inf")}, {"valor": 2.5}],
+        {"valor": "float64"},
+    )
+
+    resultado = executar_consulta(f"SELECT SUM(valor), COUNT(valor) FROM arquivo_{file_id}")
+
+    assert resultado["rows"] == [[4.0, 2]]
+
+
+def test_consulta_de_escrita_e_recusada(banco):
+    _inserir(banco, [{"valor": 1}], {"valor": "int64"})
+
+    with pytest.raises(ConsultaInvalida):
+        executar_consulta("DELETE FROM rows")
+
+
+def test_migracao_de_dados_legados_troca_nan_por_null(tmp_path, monkeypatch):
+    from services import db_service
+
+    caminho = tmp_path / "legado.db"
+    legado = sqlite3.connect(caminho)
+    legado.execute(
+        "CREATE TABLE dados (id INTEGER PRIMARY KEY, conteudo TEXT, analise_campos TEXT, file_name TEXT)"
+    )
+    # json.dumps de versões antigas gravava valores ausentes como NaN
+    legado.execute(
+        "INSERT INTO dados VALUES (1, ?, ?, 'antigo.csv')",
+        ('[{"valor": 1.5}, {"valor": NaN}, {"valor": 2.5}]', json.dumps({"tipos": {"valor": "float64"}})),
+    )
+    legado.commit()
+    legado.close()
+    monkeypatch.setattr(db_service, "DB_PATH", str(caminho))
+    db_service.init_db()
+    try:
+        resultado = executar_consulta("SELECT SUM(valor), COUNT(*) FROM arquivo_1")
+    finally:
+        db_service.close_connection()
+
+    assert resultado["rows"] == [[4.0, 3]]
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import stats_service
+from services.stats_service import DataFrameStats, HyperLogLog
+
+
+def _frame(n=1000, seed=7):
+    rng = np.random.default_rng(seed)
+    valores = rng.normal(100, 15, n)
+    valores[::17] = np.nan
+    return pd.DataFrame({
+        "valor": valores,
+        "qtd": rng.integers(0, 50, n),
+        "uf": rng.choice(["SP", "RJ", "MG"], n, p=[0.6, 0.3, 0.1]),
+    })
+
+
+def test_modo_exato_igual_ao_describe_do_pandas():
+    df = _frame()
+
+    describe = DataFrameStats(exact=True).update(df).describe()
+
+    esperado = df.describe(include="all")
+    for coluna in ("valor", "qtd"):
+        for chave in ("count", "mean", "std", "min", "25%", "50%", "75%", "max"):
+            assert describe[coluna][chave] == pytest.approx(esperado[coluna][chave]), (coluna, chave)
+    for chave in ("count", "unique", "top", "freq"):
+        assert describe["uf"][chave] == esperado["uf"][chave], chave
+
+
+def test_blocos_mesclados_iguais_ao_dataframe_inteiro():
+    df = _frame()
+    inteiro = DataFrameStats(exact=True).update(df)
+    blocos = [df.iloc[:300], df.iloc[300:650], df.iloc[650:]]
+
+    atualizado = DataFrameStats(exact=True)
+    for bloco in blocos:
+        atualizado.update(bloco)
+    mesclado = DataFrameStats(exact=True)
+    for bloco in blocos:
+        mesclado.merge(DataFrameStats(exact=True).update(bloco))
+
+    for stats in (atualizado, mesclado):
+        assert stats.rows == inteiro.rows
+        assert stats.dtypes() == inteiro.dtypes()
+        assert stats.structure_info()["column_analysis"] == inteiro.structure_info()["column_analysis"]
+        for coluna, esperado in inteiro.describe().items():
+            assert stats.describe()[coluna] == pytest.approx(esperado), coluna
+
+
+def test_colunas_ausentes_em_um_bloco_contam_como_nulas():
+    stats = DataFrameStats(exact=True)
+    stats.update(pd.DataFrame({"a": [1, 2]}))
+    stats.update(pd.DataFrame({"b": ["x"]}))
+
+    colunas = stats.structure_info()["column_analysis"]
+    assert (colunas["a"]["null_count"], colunas["b"]["null_count"]) == (1, 2)
+    assert stats.dtypes()["a"] == "float64"
+
+
+def test_hyperloglog_dentro_do_erro_esperado():
+    distintos = 200_000
+    hll = HyperLogLog()
+    valores = np.arange(distintos, dtype="float64")
+    # Repetidos não alteram a estimativa
+    hll.add(valores)
+    hll.add(valores[:1000])
+
+    # Três erros padrão (1,04 / sqrt(m))
+    limite = 3 * 1.04 / math.sqrt(1 << stats_service.HLL_PRECISION)
+    assert abs(hll.estimate() - distintos) / distintos < limite
+
+    metade_a, metade_b = HyperLogLog(), HyperLogLog()
+    metade_a.add(valores[: distintos // 2])
+    metade_b.add(valores[distintos // 4 :])
+    metade_a.merge(metade_b)
+    assert metade_a.estimate() == hll.estimate()
+
+
+def test_modo_aproximado_estima_distintos_acima_do_limite(monkeypatch):
+    monkeypatch.setattr(stats_service, "STATS_DISTINCT_LIMIT", 1000)
+    df = pd.DataFrame({"id": np.arange(50_000)})
+
+    stats = DataFrameStats(exact=False)
+    for inicio in range(0, len(df), 10_000):
+        stats.update(df.iloc[inicio : inicio + 10_000])
+
+    coluna = stats.structure_info()["column_analysis"]["id"]
+    assert coluna["unique_values_approx"] is True
+    assert abs(coluna["unique_values"] - 50_000) / 50_000 < 0.03
+    assert stats.describe()["id"]["mean"] == pytest.approx(df["id"].mean())
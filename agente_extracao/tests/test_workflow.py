@@ -0,0 +1,69 @@
+import os
+import time
+
+from agents import reader_agent, workflow
+
+_read_and_format = workflow._read_and_format
+
+
+def _morre_no_arquivo_ruim(file_path, file_type):
+    if os.path.basename(file_path) == "ruim.csv":
+        os._exit(1)
+    return _read_and_format(file_path, file_type)
+
+
+def test_lote_continua_quando_um_worker_morre(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(workflow, "_read_and_format", _morre_no_arquivo_ruim)
+    arquivos = []
+    for nome in ["ruim.csv"] + [f"ok_{i}.csv" for i in range(4)]:
+        caminho = tmp_path / nome
+        caminho.write_text(f"nome,valor\n{nome},1\n", encoding="utf-8")
+        arquivos.append({"path": str(caminho), "type": "csv"})
+
+    resultado = workflow.process_multiple_files(arquivos, max_workers=2)
+
+    por_arquivo = {r["file"]: r["status"] for r in resultado["results"]}
+    assert por_arquivo["ruim.csv"] == "error"
+    assert resultado["successful"] >= 3
+    assert resultado["successful"] + resultado["failed"] == len(arquivos)
+
+
+def _le_e_marca(file_path, file_type):
+    saida = _read_and_format(file_path, file_type)
+    open(file_path + ".lido", "w").close()
+    return saida
+
+
+def test_pool_segue_com_os_demais_enquanto_o_streaming_insere(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(reader_agent, "CSV_STREAMING_THRESHOLD", 1024)
+    monkeypatch.setattr(workflow, "_read_and_format", _le_e_marca)
+    grande = tmp_path / "grande.csv"
+    grande.write_text("nome,valor\n" + "".join(f"linha {i},{i}\n" for i in range(2000)), encoding="utf-8")
+    pequenos = []
+    for i in range(4):
+        caminho = tmp_path / f"pequeno_{i}.csv"
+        caminho.write_text(f"nome,valor\npequeno {i},{i}\n", encoding="utf-8")
+        pequenos.append(caminho)
+
+    lidos_durante_o_streaming = []
+    processar_streaming = workflow._process_streaming_file
+
+    def streaming_lento(file_path, file_type, force):
+        # Só insere depois que o pool leu todos os pequenos (ou desiste após o prazo)
+        prazo = time.monotonic() + 20
+        while time.monotonic() < prazo and not all(os.path.exists(f"{p}.lido") for p in pequenos):
+            time.sleep(0.05)
+        lidos_durante_o_streaming.extend(p for p in pequenos if os.path.exists(f"{p}.lido"))
+        return processar_streaming(file_path, file_type, force)
+
+    monkeypatch.setattr(workflow, "_process_streaming_file", streaming_lento)
+    arquivos = [{"path": str(grande), "type": "csv"}] + [
+        {"path": str(p), "type": "csv"} for p in pequenos
+    ]
+
+    resultado = workflow.process_multiple_files(arquivos, max_workers=2)
+
+    assert resultado["successful"] == len(arquivos)
+    assert len(lidos_durante_o_streaming) == len(pequenos)
+    registros = {r["file"]: r["records"] for r in resultado["results"]}
+    assert registros["grande.csv"] == 2000